@@ -1,14 +1,23 @@
 """
 FastAPI application initialization and configuration
 """
-import os
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.config import settings
-from app.exceptions import http_exception_handler, general_exception_handler
+from app.column_store import cutoff_columns
+from app.database import warmup
+from app.exceptions import (
+    DatabaseError,
+    database_exception_handler,
+    general_exception_handler,
+    http_exception_handler,
+)
+from app.logging_config import configure_logging
+from app.services import all_branches_json
+from app.ai.session_manager import session_manager
 from app.routes import colleges, branches, chat
-from dotenv import load_dotenv, find_dotenv
 
 
 def create_app() -> FastAPI:
@@ -18,25 +27,36 @@ def create_app() -> FastAPI:
     Returns:
         FastAPI: Configured FastAPI application instance
     """
-    # Load environment variables from the nearest .env file
+    configure_logging()
     
     app = FastAPI(
         title=settings.APP_NAME,
         description=settings.APP_DESCRIPTION,
-        version=settings.APP_VERSION
+        version=settings.APP_VERSION,
+        default_response_class=ORJSONResponse
     )
     
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=["*"],  
-        allow_credentials=False, 
-        allow_methods=["*"],  
-        allow_headers=["*"],  
+        allow_origins=settings.CORS_ORIGINS,
+        allow_credentials=False,
+        allow_methods=settings.CORS_METHODS,
+        allow_headers=settings.CORS_HEADERS,
     )
     
     app.add_exception_handler(HTTPException, http_exception_handler)  # type: ignore
+    app.add_exception_handler(DatabaseError, database_exception_handler)  # type: ignore
     app.add_exception_handler(Exception, general_exception_handler)  # type: ignore
     
+    # Load the dataset into memory before the first request
+    app.add_event_handler("startup", warmup)
+    app.add_event_handler("startup", all_branches_json)
+    if settings.COLUMN_STORE:
+        app.add_event_handler("startup", cutoff_columns)
+    
+    # Write out queued chat sessions before the process exits
+    app.add_event_handler("shutdown", session_manager.flush)
+    
     # Include routers
     app.include_router(colleges.router)
     app.include_router(branches.router)
@@ -6,6 +6,7 @@ This module contains:
 - Tool definitions and registry
 - Session management
 - System prompts
+- Response caching
 """
 
-__all__ = ["agent", "tools", "prompts", "session_manager"]
+__all__ = ["agent", "tools", "prompts", "session_manager", "cache"]
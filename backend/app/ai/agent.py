@@ -4,21 +4,173 @@ AI Agent with Gemini integration
 Handles conversation with Gemini 2.0 Flash model using function calling
 """
 import os
-import json
 import asyncio
-from typing import List, Dict, Any, Optional, AsyncGenerator, Callable
+import logging
+import sqlite3
+import time
+from typing import List, Dict, Any, Optional, AsyncGenerator, Callable, Tuple
 import google.generativeai as genai
+import orjson
+from google.protobuf import json_format, struct_pb2
+from google.generativeai import caching
+from google.generativeai.types import content_types
 
-from app.ai.prompts import SYSTEM_PROMPT, TOOL_CALL_MESSAGES
-from app.ai.tools import TOOL_FUNCTIONS, execute_tool
+from app.ai.cache import (
+    response_cache, PROMPT_VERSION
+)
+from app.ai.prompts import SYSTEM_PROMPT, SUMMARY_PROMPT, format_tool_call_message
+from app.ai.tools import TOOL_SCHEMAS, aexecute_tools, execute_tool
 from app.ai.session_manager import Message, ChatSession
 
 
+logger = logging.getLogger("app.ai.agent")
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize values orjson doesn't handle natively (e.g. raw database rows)"""
+    if isinstance(value, sqlite3.Row):
+        return dict(value)
+    return str(value)
+
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+# Total time budget (seconds) for answering one user message, across all
+# Gemini round-trips and tool calls
+REQUEST_BUDGET_S = float(os.getenv("AGENT_REQUEST_BUDGET_S", "60"))
+
+TIMEOUT_MESSAGE = "I found the colleges, but encountered a timeout processing the response. Please try asking again."
+
+# Raw messages kept verbatim in the prompt (4 turns); older ones are summarized
+HISTORY_KEEP_MESSAGES = 8
+# Unsummarized messages beyond the kept window before a new summary is made
+SUMMARIZE_BATCH = 4
+SUMMARY_MODEL_NAME = "gemini-2.5-flash"
+
+# Gemini sometimes streams a whole answer as one "mega-chunk"; those are
+# re-chunked into small pieces with a short delay so the UI keeps streaming
+MEGA_CHUNK_CHARS = 50
+MICRO_CHUNK_CHARS = 4
+MICRO_CHUNK_DELAY_S = 0.02
+# Upper bound on pieces per mega-chunk (keeps pacing under ~1 s per block)
+MICRO_CHUNK_MAX_PIECES = 50
+
+# Session roles mapped to Gemini roles; everything else is sent as the model
+_ROLE_MAP = {"user": "user"}
+DEFAULT_ROLE = "model"
+
+# Result row keys per list-returning tool: (name, code, branch, cutoff);
+# None where the tool's rows have no such column
+_COLLEGE_ROW = ("college_name", "college_code", "branch_name", "cutoff_rank")
+TOOL_RESULT_SCHEMAS: Dict[str, Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]] = {
+    "get_colleges_by_rank": _COLLEGE_ROW,
+    "search_colleges": _COLLEGE_ROW,
+    "get_colleges_by_branch": _COLLEGE_ROW,
+    "search_college_by_name": ("college_name", "college_code", None, None),
+    "match_branch_names": (None, None, "branch_name", None),
+}
+
+# One line template per tool, derived from its schema
+_SCHEMA_LINE_PARTS = ("{{{}}}", "({{{}}})", "- {{{}}}", "Cutoff: {{{}}}")
+TOOL_RESULT_TEMPLATES: Dict[str, str] = {
+    tool_name: " ".join(
+        part.format(key) for part, key in zip(_SCHEMA_LINE_PARTS, schema) if key
+    )
+    for tool_name, schema in TOOL_RESULT_SCHEMAS.items()
+}
+
+# Rows shown in the fallback summary
+SYNTHESIZE_ROW_LIMIT = 8
+
+# Rows of a list tool result sent back to Gemini; the model rarely uses more
+# and prompt tokens grow linearly with the payload
+TOOL_RESPONSE_MAX_ROWS = 20
+
+# Tool declarations come pre-built from the tool docstrings, so the SDK never
+# inspects the Python functions; they are converted to protos once per process
+TOOL_LIBRARY = content_types.to_function_library([{"function_declarations": TOOL_SCHEMAS}])
+
+# GenerativeModel instances shared by all agents, keyed by model name
+_MODEL_CACHE: Dict[str, genai.GenerativeModel] = {}
+_SUMMARY_MODEL_CACHE: Dict[str, genai.GenerativeModel] = {}
+
+
+def _get_model(model_name: str) -> genai.GenerativeModel:
+    """Return the shared tool-calling model for a model name"""
+    model = _MODEL_CACHE.get(model_name)
+    if model is None:
+        model = _MODEL_CACHE[model_name] = genai.GenerativeModel(
+            model_name=model_name,
+            tools=TOOL_LIBRARY,
+            system_instruction=SYSTEM_PROMPT
+        )
+    return model
+
+
+# Explicit Gemini context caching of the system prompt and tool declarations.
+# Off by default: Gemini 2.5 models already reuse a stable prompt prefix
+# implicitly, and explicit caches need a minimum prompt size and bill storage.
+USE_CACHED_CONTENT = os.getenv("GEMINI_CACHED_CONTENT", "0").lower() in ("1", "true", "yes")
+CACHED_CONTENT_TTL_S = 3600
+# Extend a cache this long before it expires, so open chats keep working
+CACHED_CONTENT_REFRESH_MARGIN_S = 300
+# Wait before retrying after a failed cache creation
+CACHED_CONTENT_RETRY_S = 600
+
+# model name -> (CachedContent or None, model or None, monotonic refresh time)
+_CACHED_CONTENT: Dict[str, Tuple[Any, Optional[genai.GenerativeModel], float]] = {}
+
+
+def _get_cached_content_model(model_name: str) -> Optional[genai.GenerativeModel]:
+    """
+    Return a model bound to a server-side cache of the static prompt prefix
+    
+    The cache is created on first use and its TTL extended before expiry.
+    Returns None when caching is disabled or unavailable.
+    """
+    if not USE_CACHED_CONTENT:
+        return None
+    
+    cached_content, model, refresh_at = _CACHED_CONTENT.get(model_name, (None, None, 0.0))
+    now = time.monotonic()
+    if now < refresh_at:
+        return model
+    
+    ttl = CACHED_CONTENT_TTL_S
+    try:
+        if cached_content is not None:
+            cached_content.update(ttl=ttl)
+        else:
+            cached_content = caching.CachedContent.create(
+                model=model_name,
+                display_name=f"kcet-counselor-{PROMPT_VERSION}",
+                system_instruction=SYSTEM_PROMPT,
+                tools=TOOL_LIBRARY,
+                ttl=ttl
+            )
+            model = genai.GenerativeModel.from_cached_content(cached_content)
+            logger.info("Created Gemini cached content %s", cached_content.name)
+    except Exception as e:
+        logger.warning("Gemini context caching unavailable: %s", e)
+        _CACHED_CONTENT[model_name] = (None, None, now + CACHED_CONTENT_RETRY_S)
+        return None
+    
+    _CACHED_CONTENT[model_name] = (cached_content, model, now + ttl - CACHED_CONTENT_REFRESH_MARGIN_S)
+    return model
+
+
+def _get_summary_model(model_name: str) -> genai.GenerativeModel:
+    """Return the shared summarization model for a model name"""
+    model = _SUMMARY_MODEL_CACHE.get(model_name)
+    if model is None:
+        model = _SUMMARY_MODEL_CACHE[model_name] = genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=SUMMARY_PROMPT
+        )
+    return model
+
 
 class AIAgent:
     """AI Agent using Gemini with function calling"""
@@ -31,16 +183,15 @@ class AIAgent:
             model_name: Gemini model to use (default: gemini-2.5-flash)
         """
         self.model_name = model_name
-        self.model = genai.GenerativeModel(
-            model_name=model_name,
-            tools=TOOL_FUNCTIONS,
-            system_instruction=SYSTEM_PROMPT
-        )
+        self.model = _get_model(model_name)
+        self.summary_model = _get_summary_model(SUMMARY_MODEL_NAME)
     
     def _build_conversation_history(self, session: ChatSession, limit: int = 10) -> List[Dict]:
         """
         Build conversation history for Gemini
         
+        Messages covered by the session summary are replaced by the summary.
+        
         Args:
             session: Chat session
             limit: Number of recent messages to include
@@ -48,23 +199,169 @@ class AIAgent:
         Returns:
             List of message dictionaries for Gemini
         """
-        recent_messages = session.get_recent_messages(limit)
         history = []
-        
-        for msg in recent_messages:
-            # Skip thinking messages (internal only)
-            if msg.role == "thinking":
-                continue
-            
-            # Map roles
-            role = "user" if msg.role == "user" else "model"
+        if session.summary:
             history.append({
-                "role": role,
-                "parts": [{"text": msg.content}]
+                "role": "user",
+                "parts": [{"text": f"Summary of our conversation so far:\n{session.summary}"}]
             })
+            history.append({"role": "model", "parts": [{"text": "Noted."}]})
         
+        history.extend(
+            {"role": _ROLE_MAP.get(msg.role, DEFAULT_ROLE), "parts": msg.parts}
+            for msg in session.iter_context_messages(limit, start=session.summary_upto)
+        )
         return history
     
+    async def _summarize_history(self, session: ChatSession, timeout: float):
+        """
+        Fold messages older than the kept window into the session summary
+        
+        Runs only once enough unsummarized messages have built up. The live
+        chat handle is dropped afterwards so the next prompt is rebuilt from
+        the summary and recent messages, leaving out old tool payloads.
+        """
+        upto = session.message_count - HISTORY_KEEP_MESSAGES
+        if upto - session.summary_upto < SUMMARIZE_BATCH:
+            return
+        
+        transcript = "\n".join(
+            f"{'Student' if msg.role == 'user' else 'Counselor'}: {msg.content}"
+            for msg in session.iter_messages(session.summary_upto, upto)
+            if msg.role != "thinking"
+        )
+        prompt = f"Previous summary:\n{session.summary or '(none)'}\n\nNew messages:\n{transcript}"
+        
+        try:
+            response = await asyncio.wait_for(
+                self.summary_model.generate_content_async(prompt),
+                timeout=timeout
+            )
+            summary = response.text.strip()
+        except Exception as e:
+            # Keep the previous summary; recent messages are still sent verbatim
+            logger.warning("Failed to summarize conversation: %s", e, extra={"session_id": session.session_id})
+            return
+        
+        session.summary = summary
+        session.summary_upto = upto
+        session.gemini_chat = None
+    
+    def _get_chat(self, session: ChatSession):
+        """
+        Get the session's Gemini chat, creating it from stored history if needed
+        
+        The chat handle keeps its own history, so later turns only send the
+        new message instead of re-serializing the whole conversation.
+        """
+        if session.gemini_chat is None:
+            history = self._build_conversation_history(session, limit=HISTORY_KEEP_MESSAGES)
+            # The current user message is already stored; it is sent separately
+            if history and history[-1]["role"] == "user":
+                history.pop()
+            model = self.model
+            # Only the shared default model has a matching cached prefix
+            if model is _MODEL_CACHE.get(self.model_name):
+                model = _get_cached_content_model(self.model_name) or model
+            session.gemini_chat = model.start_chat(history=history)
+        return session.gemini_chat
+    
+    @staticmethod
+    def _is_first_turn(session: ChatSession) -> bool:
+        """
+        Whether the current message opens the conversation
+        
+        The current user message is stored before it is processed, so a first
+        turn has at most the welcome message before it.
+        """
+        if session.summary or session.message_count > 2:
+            return False
+        return sum(msg.role == "user" for msg in session.iter_messages()) <= 1
+    
+    @staticmethod
+    def _function_calls(response) -> List[Any]:
+        """Return every function call in the first candidate of a response"""
+        try:
+            parts = response.candidates[0].content.parts
+        except (AttributeError, IndexError):
+            return []
+        return [part.function_call for part in parts if getattr(part, "function_call", None)]
+    
+    @staticmethod
+    def _response_struct(result: Dict[str, Any]) -> struct_pb2.Struct:
+        """Convert a tool result into the Struct sent as a FunctionResponse"""
+        # IMPORTANT: FunctionResponse.response must be a dict, not a list
+        if result.get("success"):
+            # Wrap data in a dict with 'result' key
+            data = result.get("data", [])
+            tool_response_data = {"result": data}
+            if isinstance(data, list) and len(data) > TOOL_RESPONSE_MAX_ROWS:
+                tool_response_data = {
+                    "result": data[:TOOL_RESPONSE_MAX_ROWS],
+                    "total_results": len(data)
+                }
+        else:
+            # Send error in a dict
+            tool_response_data = {"error": result.get("error", "Unknown error")}
+        
+        return json_format.ParseDict(tool_response_data, struct_pb2.Struct())
+    
+    @classmethod
+    def _function_response_part(cls, tool_name: str, parameters: Dict[str, Any], result: Dict[str, Any]):
+        """
+        Wrap a tool result as a FunctionResponse part for Gemini
+        
+        The response Struct of a memoized result is built once and kept in the
+        tool cache beside it, so repeated calls skip the conversion.
+        """
+        response_struct = execute_tool.cache_derived(tool_name, parameters, result, cls._response_struct)
+        
+        return genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(
+                name=tool_name,
+                response=response_struct
+            )
+        )
+    
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Extract the text of a streamed chunk, ignoring non-text parts"""
+        try:
+            return chunk.text
+        except (ValueError, IndexError):
+            if not chunk.candidates:
+                return ""
+            return "".join(
+                part.text for part in chunk.candidates[0].content.parts
+                if getattr(part, "text", None)
+            )
+    
+    @staticmethod
+    async def _paced_chunks(text: str) -> AsyncGenerator[str, None]:
+        """Split a mega-chunk into small paced pieces; pass other chunks through"""
+        if len(text) <= MEGA_CHUNK_CHARS:
+            yield text
+            return
+        
+        size = max(MICRO_CHUNK_CHARS, -(-len(text) // MICRO_CHUNK_MAX_PIECES))
+        for i in range(0, len(text), size):
+            if i:
+                await asyncio.sleep(MICRO_CHUNK_DELAY_S)
+            yield text[i:i + size]
+    
+    async def _send_message(self, chat, content):
+        """
+        Send content to Gemini with streaming enabled
+        
+        Function-call turns are drained immediately since the call needs the
+        complete arguments; text turns are returned unconsumed so the caller
+        can stream them as they arrive.
+        """
+        response = await chat.send_message_async(content, stream=True)
+        if self._function_calls(response):
+            await response.resolve()
+        return response
+    
     async def process_message(
         self,
         user_message: str,
@@ -84,11 +381,27 @@ class AIAgent:
         Yields:
             Response chunks from Gemini
         """
-        # Build conversation history
-        history = self._build_conversation_history(session)
+        # Serve repeated opening questions from the response cache
+        cache_key = response_cache.make_key(user_message) if self._is_first_turn(session) else None
+        if cache_key is not None:
+            cached_chunks = response_cache.get(cache_key)
+            if cached_chunks is not None:
+                # Gemini never saw this turn; rebuild the chat from stored messages next time
+                session.gemini_chat = None
+                for chunk in cached_chunks:
+                    yield chunk
+                return
         
-        # Create chat session
-        chat = self.model.start_chat(history=history)
+        # One deadline for the whole request, shared by every Gemini call
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REQUEST_BUDGET_S
+        
+        def remaining() -> float:
+            return max(0.1, deadline - loop.time())
+        
+        # Keep the prompt bounded, then reuse the session's chat handle
+        await self._summarize_history(session, timeout=remaining())
+        chat = self._get_chat(session)
         
         # Send message to Gemini
         if emit_thinking:
@@ -96,107 +409,97 @@ class AIAgent:
         
         last_tool_result = None
         last_tool_name = None
-        response = await chat.send_message_async(user_message)
+        try:
+            response = await asyncio.wait_for(
+                self._send_message(chat, user_message),
+                timeout=remaining()
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Timeout waiting for Gemini response", extra={"session_id": session.session_id})
+            session.gemini_chat = None
+            yield TIMEOUT_MESSAGE
+            return
+        except Exception:
+            session.gemini_chat = None
+            raise
         
         # Handle function calls
         max_iterations = 10  # Prevent infinite loops
         iteration = 0
         
         while iteration < max_iterations:
-            # Check if there's a function call in the response
-            has_function_call = False
-            function_call = None
-            
-            try:
-                if (response.candidates and 
-                    len(response.candidates) > 0 and 
-                    response.candidates[0].content.parts and
-                    len(response.candidates[0].content.parts) > 0):
-                    
-                    first_part = response.candidates[0].content.parts[0]
-                    if hasattr(first_part, 'function_call') and first_part.function_call:
-                        has_function_call = True
-                        function_call = first_part.function_call
-            except Exception as e:
-                # If we can't check for function calls, break the loop
-                print(f"Error checking for function call: {e}")
-                break
-            
-            if not has_function_call:
+            # Check if there are function calls in the response
+            function_calls = self._function_calls(response)
+            if not function_calls:
                 break
             
             iteration += 1
             
-            tool_name = function_call.name
-            parameters = dict(function_call.args)
-            print(f"Agent: executing tool {tool_name} with params {parameters}")
-            
-            print(f"\n🔧 TOOL CALL: {tool_name}")
-            print(f"📥 Parameters: {parameters}")
+            calls = [(function_call.name, dict(function_call.args)) for function_call in function_calls]
             
             # Emit tool call start
-            if emit_thinking:
-                # Get custom message for this tool
-                thinking_msg = TOOL_CALL_MESSAGES.get(tool_name, f"🔧 Using {tool_name}...")
-                # Format with parameters if present
-                try:
-                    thinking_msg = thinking_msg.format(**parameters)
-                except:
-                    pass
-                await emit_thinking(thinking_msg)
-            
-            if emit_tool_call:
-                await emit_tool_call(tool_name, parameters, "started")
-
-            result = execute_tool(tool_name, parameters)
-            last_tool_result = result
-            last_tool_name = tool_name
-
-            print(f"📤 Result: success={result.get('success')}, data_length={len(str(result.get('data', [])))}")
-            
-            # Emit tool call completion
-            if emit_tool_call:
-                status = "completed" if result["success"] else "failed"
-                await emit_tool_call(tool_name, parameters, status)
-            
-            if emit_thinking:
-                await emit_thinking(f"✅ {result['summary']}")
+            for call_name, parameters in calls:
+                logger.debug(
+                    "Executing tool %s with params %s", call_name, parameters,
+                    extra={"session_id": session.session_id, "tool": call_name, "iteration": iteration}
+                )
+                if emit_thinking:
+                    await emit_thinking(format_tool_call_message(call_name, parameters))
+                if emit_tool_call:
+                    await emit_tool_call(call_name, parameters, "started")
             
-            # Send tool result back to Gemini
-            # IMPORTANT: FunctionResponse.response must be a dict, not a list
-            # Wrap the result properly
-            if result.get("success"):
-                # Wrap data in a dict with 'result' key
-                tool_response_data = {"result": result.get("data", [])}
-            else:
-                # Send error in a dict
-                tool_response_data = {"error": result.get("error", "Unknown error")}
+            # Memoized results come back immediately; the rest do blocking DB work
+            # in a worker thread, sharing one connection and read transaction
+            results = await aexecute_tools(calls)
             
-            print(f"📨 Sending to Gemini: {type(tool_response_data)}, keys={list(tool_response_data.keys())}")
+            response_parts = []
+            for (call_name, parameters), result in zip(calls, results):
+                last_tool_result = result
+                last_tool_name = call_name
+                
+                if logger.isEnabledFor(logging.DEBUG):
+                    data = result.get("data") or []
+                    data_length = len(data) if isinstance(data, (list, dict)) else 1
+                    logger.debug(
+                        "Tool %s result: success=%s, data_length=%d",
+                        call_name, result.get("success"), data_length,
+                        extra={"session_id": session.session_id, "tool": call_name, "data_length": data_length}
+                    )
+                
+                # Emit tool call completion
+                if emit_tool_call:
+                    status = "completed" if result["success"] else "failed"
+                    await emit_tool_call(call_name, parameters, status)
+                
+                if emit_thinking:
+                    await emit_thinking(f"✅ {result['summary']}")
+                
+                response_parts.append(self._function_response_part(call_name, parameters, result))
             
-            function_response = genai.protos.Part(
-                function_response=genai.protos.FunctionResponse(
-                    name=tool_name,
-                    response=tool_response_data
-                )
-            )
+            # Send all tool results back to Gemini in one message
+            function_response = response_parts[0] if len(response_parts) == 1 else response_parts
             
-            print("⏳ Waiting for Gemini response after tool call...")
             try:
-                # Add timeout to prevent hanging
+                # Bound by the remaining request budget to prevent hanging
                 response = await asyncio.wait_for(
-                    chat.send_message_async(function_response),
-                    timeout=30.0  # 30 second timeout
+                    self._send_message(chat, function_response),
+                    timeout=remaining()
                 )
-                print("✅ Received response from Gemini")
             except asyncio.TimeoutError:
-                print("❌ Timeout waiting for Gemini response")
+                logger.warning(
+                    "Timeout waiting for Gemini response after tool %s", last_tool_name,
+                    extra={"session_id": session.session_id, "tool": last_tool_name}
+                )
                 # Break out and return what we have
-                final_text = "I found the colleges, but encountered a timeout processing the response. Please try asking again."
-                yield final_text
+                session.gemini_chat = None
+                yield TIMEOUT_MESSAGE
                 return
             except Exception as e:
-                print(f"❌ Error getting response from Gemini: {e}")
+                logger.error(
+                    "Error getting response from Gemini after tool %s: %s", last_tool_name, e,
+                    extra={"session_id": session.session_id, "tool": last_tool_name}
+                )
+                session.gemini_chat = None
                 final_text = "I encountered an error after fetching the data. Please try asking again."
                 yield final_text
                 return
@@ -205,25 +508,37 @@ class AIAgent:
         if emit_thinking:
             await emit_thinking("✨ Preparing response...")
         
-        # Stream the final response
-        try:
-            final_text = response.text
-        except ValueError as e:
-            # If response.text fails (e.g., function call parts), extract text from parts
-            final_text = ""
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, 'text') and part.text:
-                    final_text += part.text
+        # Stream the final response as chunks arrive from Gemini
+        # Each chunk fetch is bounded by the deadline; the timeout is not held
+        # across yields so it can never cancel the consumer mid-send
+        streamed_chunks = []
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(anext(chunks), timeout=remaining())
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                logger.warning("Timeout while streaming Gemini response", extra={"session_id": session.session_id})
+                # A broken stream leaves the chat history incoherent; rebuild next turn
+                session.gemini_chat = None
+                if not streamed_chunks:
+                    yield TIMEOUT_MESSAGE
+                return
             
-            # If still no text, provide a default message
-            if not final_text:
-                final_text = "I apologize, but I encountered an issue processing your request. Please try rephrasing your question."
+            text = self._chunk_text(chunk)
+            if text:
+                streamed_chunks.append(text)
+                async for piece in self._paced_chunks(text):
+                    yield piece
+        
+        # If no text came through, provide a default message
+        if not streamed_chunks:
+            yield "I apologize, but I encountered an issue processing your request. Please try rephrasing your question."
+            return
         
-        # Yield response in chunks (simulate streaming)
-        chunk_size = 50
-        for i in range(0, len(final_text), chunk_size):
-            chunk = final_text[i:i + chunk_size]
-            yield chunk
+        if cache_key is not None:
+            response_cache.set(cache_key, streamed_chunks)
 
     def _synthesize_from_tool(self, tool_name: str, result: Dict[str, Any]) -> str:
         """Create a readable summary string from a tool result as a fallback when Gemini returns no text.
@@ -237,10 +552,22 @@ class AIAgent:
 
         # If data is a list of colleges, summarize top entries
         if isinstance(data, list):
+            rows = data[:SYNTHESIZE_ROW_LIMIT]
+            limit = len(rows)
+            header = f"Here are the top {limit} results from {tool_name}:\n\n"
+            
+            # Known tools: one schema lookup, direct key access per row
+            template = TOOL_RESULT_TEMPLATES.get(tool_name)
+            if template is not None:
+                return header + "\n".join(template.format_map(item) for item in rows)
+            
+            # Plain lists (e.g. branch names)
+            if not rows or not isinstance(rows[0], dict):
+                return header + "\n".join(map(str, rows))
+            
+            # Unknown tools: guess common keys
             lines = []
-            limit = min(8, len(data))
-            for i in range(limit):
-                item = data[i]
+            for item in rows:
                 # Try common keys
                 name = item.get("college_name") or item.get("college") or item.get("name")
                 code = item.get("college_code") or item.get("code") or item.get("id")
@@ -256,13 +583,12 @@ class AIAgent:
                 if cutoff:
                     parts.append(f"Cutoff: {cutoff}")
                 lines.append(" ".join(parts))
-            header = f"Here are the top {limit} results from {tool_name}:\n\n"
             return header + "\n".join(lines)
 
         # If data is a dict with branches or trends
         if isinstance(data, dict):
             try:
-                return json.dumps(data, indent=2, ensure_ascii=False)
+                return orjson.dumps(data, default=_json_default, option=orjson.OPT_INDENT_2).decode()
             except Exception:
                 return str(data)
 
@@ -0,0 +1,89 @@
+"""
+Response cache for AI agent
+
+Caches final assistant responses to opening questions so a question many
+students start with ("I got rank 5000...") skips the Gemini round-trip and
+tool calls entirely
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.ai.prompts import SYSTEM_PROMPT
+from app.config import settings
+
+
+# Changes whenever the system prompt changes so stale answers are never served
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
+def normalize_message(message: str) -> str:
+    """Normalize a user message so trivial variations share a cache entry"""
+    return " ".join(message.lower().split())
+
+
+class ResponseCache:
+    """
+    Bounded in-process LRU cache of streamed responses to first turns
+
+    Only the opening message of a conversation is cached: its answer depends
+    on nothing but the prompt, the dataset and the message itself, so it can
+    be shared between sessions. Later turns depend on the conversation so far
+    and always go to Gemini.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600.0):
+        """
+        Initialize response cache
+
+        Args:
+            maxsize: Maximum number of cached responses
+            ttl: Seconds before a cached response expires
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[str]]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(user_message: str) -> str:
+        """
+        Build the exact-match cache key for an opening message
+
+        Args:
+            user_message: Raw user message
+
+        Returns:
+            SHA-256 hex digest of prompt version, dataset version and normalized message
+        """
+        raw = "\x1f".join((PROMPT_VERSION, settings.DATA_VERSION, normalize_message(user_message)))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """Return the cached response chunks for a key, if present and fresh"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        created_at, chunks = entry
+        if time.monotonic() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return chunks
+
+    def set(self, key: str, chunks: List[str]):
+        """Store response chunks for a key, evicting the oldest entry if full"""
+        self._entries[key] = (time.monotonic(), list(chunks))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached responses"""
+        self._entries.clear()
+
+
+# Global response cache instance
+response_cache = ResponseCache()
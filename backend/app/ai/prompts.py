@@ -1,6 +1,8 @@
 """
 System prompts and templates for AI agent
 """
+from collections import defaultdict
+from typing import Any, Callable, Dict
 
 SYSTEM_PROMPT = """You are an expert KCET (Karnataka Common Entrance Test) college counselor AI assistant helping students with engineering college admissions in Karnataka.
 
@@ -71,6 +73,15 @@ PRESENTATION RULES:
 Remember: Use helper tools to handle casual user input, then fetch real data!
 """
 
+SUMMARY_PROMPT = """You summarize conversations between a student and a KCET college counselor assistant.
+
+Write a short factual summary (at most 150 words) that preserves everything needed to continue the conversation:
+- The student's rank, round, category and branch/college preferences
+- Colleges, branches and college codes that were discussed, with any cutoff ranks mentioned
+- Open questions or decisions the student is still making
+
+Do not add advice or information that was not in the conversation."""
+
 WELCOME_MESSAGE = """👋 Hello! I'm your AI KCET College Counselor.
 
 I can help you with:
@@ -110,3 +121,26 @@ TOOL_CALL_MESSAGES = {
     "compare_colleges": "⚖️ Comparing colleges...",
     "get_branch_popularity": "📈 Analyzing branch popularity...",
 }
+
+
+# Bound format_map of each known tool's thinking message template
+_TOOL_CALL_FORMATTERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    tool_name: template.format_map for tool_name, template in TOOL_CALL_MESSAGES.items()
+}
+
+
+def format_tool_call_message(tool_name: str, parameters: Dict[str, Any]) -> str:
+    """
+    Format the thinking message shown while a tool runs
+    
+    Missing parameters are rendered as empty strings instead of raising.
+    Unknown tool names (supplied by the model) are shown as-is, never used
+    as a template.
+    """
+    formatter = _TOOL_CALL_FORMATTERS.get(tool_name)
+    if formatter is None:
+        return f"🔧 Using {tool_name}..."
+    try:
+        return formatter(defaultdict(str, parameters))
+    except (KeyError, IndexError, ValueError):
+        return TOOL_CALL_MESSAGES[tool_name]
@@ -1,23 +1,126 @@
 """
 Session Manager for chat conversations
 
-Handles creating, storing, and retrieving chat sessions with JSON file persistence
+Handles creating, storing, and retrieving chat sessions with SQLite
+persistence. Sessions and their messages live in one database in WAL mode;
+a background thread writes changed sessions in batched transactions.
 """
-import json
+import hashlib
+import itertools
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
-from uuid import uuid4
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-# Directory to store session files
+import orjson
+
+# Directory to store session data
 SESSIONS_DIR = Path(__file__).parent.parent.parent / "sessions"
 SESSIONS_DIR.mkdir(exist_ok=True)
 
+SESSIONS_DB_NAME = "sessions.db"
+
+SESSIONS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    context BLOB NOT NULL,
+    metadata BLOB NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    summary_upto INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    content_ref TEXT,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS content_blobs (
+    content_ref TEXT PRIMARY KEY,
+    content TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Message content at least this long is stored once in content_blobs, keyed by
+# its hash, and referenced from each message row (tool results such as the
+# branch list repeat verbatim across turns and sessions)
+CONTENT_REF_MIN_LENGTH = 512
+
+# Shared content strings kept in memory so sessions loading the same blob
+# reference one string
+CONTENT_INTERN_SIZE = 4096
+
+# Session files written before the SQLite store; imported once on startup
+SESSION_FILE_SUFFIX = ".json"
+
+# Bytes of the sessions database SQLite may memory-map; reads of mapped pages
+# skip the copy through SQLite's page cache
+SESSIONS_DB_MMAP_SIZE = 64 * 1024 * 1024
+
+# Most recent messages kept in memory per session; older ones stay in the
+# database only
+MESSAGE_WINDOW = 1000
+
+# Maximum number of sessions kept in memory
+SESSION_CACHE_SIZE = 1024
+
+
+# UUIDs generated per os.urandom() call
+UUID_BATCH_SIZE = 256
+
+
+def _uuid_stream() -> Iterator[str]:
+    """Yield random (version 4) UUID strings, drawing randomness in batches"""
+    while True:
+        raw = bytearray(os.urandom(16 * UUID_BATCH_SIZE))
+        for start in range(0, len(raw), 16):
+            # Set the version (4) and RFC 4122 variant bits, as uuid4() does
+            raw[start + 6] = (raw[start + 6] & 0x0F) | 0x40
+            raw[start + 8] = (raw[start + 8] & 0x3F) | 0x80
+            h = raw[start:start + 16].hex()
+            yield f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+_uuids = _uuid_stream()
+_uuid_lock = threading.Lock()
+
+
+def new_id() -> str:
+    """Return a new random UUID string (same format as str(uuid4()))"""
+    with _uuid_lock:
+        return next(_uuids)
+
+
+def content_ref(content: str) -> str:
+    """Content-addressable key for a message body"""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def connect_sessions_db(db_path: Path) -> sqlite3.Connection:
+    """Open a connection to the sessions database"""
+    conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={SESSIONS_DB_MMAP_SIZE}")
+    return conn
+
 
 class Message:
     """Represents a single message in a conversation"""
     
+    __slots__ = ("message_id", "role", "content", "timestamp", "timestamp_iso", "metadata", "parts", "_cached_dict")
+    
     def __init__(
         self,
         role: str,
@@ -26,21 +129,28 @@ class Message:
         timestamp: Optional[datetime] = None,
         metadata: Optional[Dict] = None
     ):
-        self.message_id = message_id or str(uuid4())
+        self.message_id = message_id or new_id()
         self.role = role  # "user", "assistant", "system", "thinking"
         self.content = content
         self.timestamp = timestamp or datetime.now()
+        self.timestamp_iso = self.timestamp.isoformat()
         self.metadata = metadata or {}
+        # Gemini content parts, built once instead of on every history rebuild
+        self.parts = [{"text": content}]
+        # Messages are not mutated after creation, so the dict is built once
+        self._cached_dict: Optional[Dict] = None
     
     def to_dict(self) -> Dict:
-        """Convert message to dictionary"""
-        return {
-            "message_id": self.message_id,
-            "role": self.role,
-            "content": self.content,
-            "timestamp": self.timestamp.isoformat(),
-            "metadata": self.metadata
-        }
+        """Convert message to dictionary (cached; treat as read-only)"""
+        if self._cached_dict is None:
+            self._cached_dict = {
+                "message_id": self.message_id,
+                "role": self.role,
+                "content": self.content,
+                "timestamp": self.timestamp_iso,
+                "metadata": self.metadata
+            }
+        return self._cached_dict
     
     @classmethod
     def from_dict(cls, data: Dict) -> "Message":
@@ -55,135 +165,471 @@ class Message:
 
 
 class ChatSession:
-    """Represents a chat session with full conversation history"""
+    """Represents a chat session with a bounded window of recent messages"""
+    
+    __slots__ = (
+        "session_id", "created_at", "created_at_iso", "_updated_at", "updated_at_iso",
+        "messages", "context", "metadata", "summary", "summary_upto", "gemini_chat", "message_offset", "persisted_count", "spilled"
+    )
     
     def __init__(
         self,
         session_id: Optional[str] = None,
         created_at: Optional[datetime] = None,
         updated_at: Optional[datetime] = None,
-        messages: Optional[List[Message]] = None,
+        messages: Optional[Iterable[Message]] = None,
         context: Optional[Dict] = None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        summary: str = "",
+        summary_upto: int = 0,
+        message_offset: int = 0
     ):
-        self.session_id = session_id or str(uuid4())
+        self.session_id = session_id or new_id()
         self.created_at = created_at or datetime.now()
+        self.created_at_iso = self.created_at.isoformat()
         self.updated_at = updated_at or datetime.now()
-        self.messages = messages or []
+        self.messages: Deque[Message] = deque(messages or (), maxlen=MESSAGE_WINDOW)
         self.context = context or {}  # Store user preferences, rank, etc.
         self.metadata = metadata or {}
+        # Rolling summary of the first summary_upto messages, sent instead of them
+        self.summary = summary
+        self.summary_upto = summary_upto
+        # Live Gemini chat handle reused across turns (not persisted)
+        self.gemini_chat = None
+        # Absolute index of messages[0]; earlier messages are only in the store
+        self.message_offset = message_offset
+        # Number of messages (from the start of the session) already queued for writing
+        self.persisted_count = self.message_count
+        # Messages pushed out of the window before being queued for writing
+        self.spilled: List[Message] = []
+    
+    @property
+    def updated_at(self) -> datetime:
+        """Time of the last change (updated_at_iso is kept in sync)"""
+        return self._updated_at
+    
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        self._updated_at = value
+        self.updated_at_iso = value.isoformat()
+    
+    @property
+    def message_count(self) -> int:
+        """Total number of messages in the session, including ones outside the window"""
+        return self.message_offset + len(self.messages)
     
     def add_message(self, message: Message):
         """Add a message to the session"""
+        if len(self.messages) == self.messages.maxlen:
+            # The oldest message drops out of the window; keep it until it is written
+            if self.message_offset >= self.persisted_count:
+                self.spilled.append(self.messages[0])
+            self.message_offset += 1
         self.messages.append(message)
         self.updated_at = datetime.now()
     
+    def iter_messages(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Message]:
+        """Iterate over in-memory messages by absolute index range [start, stop)"""
+        offset = self.message_offset
+        return itertools.islice(
+            self.messages,
+            max(start - offset, 0),
+            None if stop is None else max(stop - offset, 0)
+        )
+    
     def get_recent_messages(self, limit: int = 10) -> List[Message]:
         """Get recent messages for context (last N messages)"""
-        return self.messages[-limit:] if len(self.messages) > limit else self.messages
+        return list(itertools.islice(self.messages, max(len(self.messages) - limit, 0), None))
     
-    def to_dict(self) -> Dict:
-        """Convert session to dictionary"""
+    def iter_context_messages(self, limit: int = 10, start: int = 0) -> Iterator[Message]:
+        """Iterate over the last N messages from absolute index start, skipping internal thinking messages"""
+        start = max(start, self.message_count - limit)
+        return (msg for msg in self.iter_messages(start) if msg.role != "thinking")
+    
+    def header_dict(self) -> Dict:
+        """Convert session fields (everything except messages) to a dictionary"""
         return {
             "session_id": self.session_id,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
-            "messages": [msg.to_dict() for msg in self.messages],
+            "created_at": self.created_at_iso,
+            "updated_at": self.updated_at_iso,
             "context": self.context,
-            "metadata": self.metadata
+            "metadata": self.metadata,
+            "summary": self.summary,
+            "summary_upto": self.summary_upto
         }
     
+    def to_dict(self) -> Dict:
+        """Convert session to dictionary"""
+        data = self.header_dict()
+        data["messages"] = [msg.to_dict() for msg in self.messages]
+        return data
+    
     @classmethod
     def from_dict(cls, data: Dict) -> "ChatSession":
-        """Create session from dictionary"""
+        """Create session from dictionary (only the last MESSAGE_WINDOW messages are kept)"""
+        messages = data["messages"]
+        message_offset = max(len(messages) - MESSAGE_WINDOW, 0)
         return cls(
             session_id=data["session_id"],
             created_at=datetime.fromisoformat(data["created_at"]),
             updated_at=datetime.fromisoformat(data["updated_at"]),
-            messages=[Message.from_dict(msg) for msg in data["messages"]],
+            messages=[Message.from_dict(msg) for msg in messages[message_offset:]],
+            message_offset=message_offset,
             context=data.get("context", {}),
-            metadata=data.get("metadata", {})
+            metadata=data.get("metadata", {}),
+            summary=data.get("summary", ""),
+            summary_upto=data.get("summary_upto", 0)
         )
 
 
 class SessionManager:
-    """Manages chat sessions with JSON file persistence"""
+    """Manages chat sessions with SQLite persistence"""
     
-    def __init__(self, sessions_dir: Path = SESSIONS_DIR):
+    def __init__(self, sessions_dir: Path = SESSIONS_DIR, cache_size: int = SESSION_CACHE_SIZE):
         self.sessions_dir = sessions_dir
         self.sessions_dir.mkdir(exist_ok=True)
-        # In-memory cache for active sessions
-        self._cache: Dict[str, ChatSession] = {}
+        self.db_path = self.sessions_dir / SESSIONS_DB_NAME
+        # Connection for request-path reads and deletes; the writer thread has its own
+        self._conn = connect_sessions_db(self.db_path)
+        self._conn_lock = threading.Lock()
+        self._conn.executescript(SESSIONS_SCHEMA)
+        self._migrate_schema()
+        # content_ref -> content for blobs loaded so far
+        self._interned: Dict[str, str] = {}
+        self._import_session_files()
+        # In-memory LRU cache for active sessions
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, ChatSession]" = OrderedDict()
+        # The cache is shared by the event loop and the threads routes load sessions on
+        self._cache_lock = threading.RLock()
+        # Captured (session_id, session row, message rows) waiting for the writer
+        self._write_queue: "queue.Queue[Tuple[str, tuple, List[tuple]]]" = queue.Queue()
+        # Queued-but-unwritten writes per session, so a load or delete waits
+        # only for the session it touches
+        self._pending_writes: Dict[str, int] = {}
+        self._pending_done = threading.Condition()
+        self._writer = threading.Thread(target=self._writer_loop, name="session-writer", daemon=True)
+        self._writer.start()
+    
+    @staticmethod
+    def _capture_write(session: ChatSession) -> Tuple[str, tuple, List[tuple]]:
+        """
+        Snapshot the rows that need writing for a session
+        
+        Runs on the caller's thread, so the writer thread never reads a
+        session that is being modified.
+        
+        Returns:
+            Tuple of (session_id, session row, new message rows)
+        """
+        session_id = session.session_id
+        session_row = (
+            session_id,
+            session.created_at_iso,
+            session.updated_at_iso,
+            orjson.dumps(session.context),
+            orjson.dumps(session.metadata),
+            session.summary,
+            session.summary_upto,
+        )
+        
+        start = session.persisted_count
+        new_messages = itertools.chain(session.spilled, session.iter_messages(start))
+        message_rows = [
+            (
+                session_id, seq, msg.message_id, msg.role, msg.content,
+                msg.timestamp_iso, orjson.dumps(msg.metadata)
+            )
+            for seq, msg in enumerate(new_messages, start)
+        ]
+        session.spilled.clear()
+        session.persisted_count = session.message_count
+        return session_id, session_row, message_rows
     
-    def _get_session_file(self, session_id: str) -> Path:
-        """Get the file path for a session"""
-        return self.sessions_dir / f"{session_id}.json"
+    def _migrate_schema(self):
+        """Add columns introduced after a database was created"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+        if "content_ref" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE messages ADD COLUMN content_ref TEXT")
+    
+    @staticmethod
+    def _write_rows(conn: sqlite3.Connection, session_rows: Iterable[tuple], message_rows: Iterable[tuple]):
+        """
+        Upsert session rows and insert message rows (caller commits)
+        
+        Long message content is moved into content_blobs, so each distinct
+        body is stored once however many messages repeat it.
+        """
+        blob_rows = {}
+        stored_rows = []
+        for row in message_rows:
+            content = row[4]
+            if len(content) >= CONTENT_REF_MIN_LENGTH:
+                ref = content_ref(content)
+                blob_rows[ref] = content
+                stored_rows.append(row[:4] + ("",) + row[5:] + (ref,))
+            else:
+                stored_rows.append(row + (None,))
+        
+        conn.executemany(
+            """
+            INSERT INTO sessions (session_id, created_at, updated_at, context, metadata, summary, summary_upto)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (session_id) DO UPDATE SET
+                updated_at = excluded.updated_at,
+                context = excluded.context,
+                metadata = excluded.metadata,
+                summary = excluded.summary,
+                summary_upto = excluded.summary_upto
+            """,
+            session_rows
+        )
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO messages (session_id, seq, message_id, role, content, timestamp, metadata, content_ref)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            stored_rows
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO content_blobs (content_ref, content) VALUES (?, ?)",
+            blob_rows.items()
+        )
+    
+    def _import_session_files(self):
+        """Move sessions saved as .json files into the database (one time)"""
+        with os.scandir(self.sessions_dir) as entries:
+            session_files = [entry.path for entry in entries if entry.name.endswith(SESSION_FILE_SUFFIX)]
+        
+        for path in session_files:
+            try:
+                with open(path, 'rb') as f:
+                    data = orjson.loads(f.read())
+                
+                session_id, session_row, _ = self._capture_write(ChatSession.from_dict(data))
+                message_rows = [
+                    (
+                        session_id, seq, msg["message_id"], msg["role"], msg["content"],
+                        msg["timestamp"], orjson.dumps(msg.get("metadata", {}))
+                    )
+                    for seq, msg in enumerate(data["messages"])
+                ]
+                with self._conn:
+                    self._write_rows(self._conn, [session_row], message_rows)
+                os.unlink(path)
+            except Exception as e:
+                print(f"Error importing session file {path}: {e}")
+    
+    def _queue_write(self, session: ChatSession):
+        """Capture a session's changes and hand them to the writer thread"""
+        write = self._capture_write(session)
+        with self._pending_done:
+            self._pending_writes[write[0]] = self._pending_writes.get(write[0], 0) + 1
+        self._write_queue.put(write)
+    
+    def _wait_for_writes(self, session_id: str):
+        """Block until every write queued for one session has been written"""
+        with self._pending_done:
+            self._pending_done.wait_for(lambda: session_id not in self._pending_writes)
+    
+    def _cache_session(self, session: ChatSession):
+        """Mark a session as most recently used, evicting the least recent one if full"""
+        with self._cache_lock:
+            self._cache[session.session_id] = session
+            self._cache.move_to_end(session.session_id)
+            while len(self._cache) > self.cache_size:
+                _, evicted = self._cache.popitem(last=False)
+                # Persist any changes not yet written before dropping it from memory
+                self._queue_write(evicted)
+    
+    def get_cached_session(self, session_id: str) -> Optional[ChatSession]:
+        """Get a session if it is in memory (never touches the database)"""
+        with self._cache_lock:
+            session = self._cache.get(session_id)
+            if session is not None:
+                self._cache.move_to_end(session_id)
+            return session
     
     def create_session(self) -> ChatSession:
         """Create a new chat session"""
         session = ChatSession()
-        self._save_session(session)
-        self._cache[session.session_id] = session
+        self._cache_session(session)
+        self._queue_write(session)
         return session
     
     def get_session(self, session_id: str) -> Optional[ChatSession]:
-        """Get a session by ID"""
+        """
+        Get a session by ID
+        
+        Loading a session that is not in memory reads the database, so async
+        callers should check get_cached_session first and run this in a
+        worker thread.
+        """
         # Check cache first
-        if session_id in self._cache:
-            return self._cache[session_id]
+        session = self.get_cached_session(session_id)
+        if session is not None:
+            return session
         
-        # Load from file
-        session_file = self._get_session_file(session_id)
-        if not session_file.exists():
-            return None
+        # An evicted session may still be queued for writing
+        self._wait_for_writes(session_id)
         
         try:
-            with open(session_file, 'r') as f:
-                data = json.load(f)
-            session = ChatSession.from_dict(data)
-            self._cache[session_id] = session
+            with self._conn_lock:
+                row = self._conn.execute(
+                    "SELECT created_at, updated_at, context, metadata, summary, summary_upto "
+                    "FROM sessions WHERE session_id = ?",
+                    (session_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                # Newest MESSAGE_WINDOW messages, via the primary key in reverse
+                message_rows = self._conn.execute(
+                    "SELECT m.seq, m.message_id, m.role, m.content_ref, COALESCE(b.content, m.content), "
+                    "m.timestamp, m.metadata "
+                    "FROM messages AS m LEFT JOIN content_blobs AS b ON b.content_ref = m.content_ref "
+                    "WHERE m.session_id = ? ORDER BY m.seq DESC LIMIT ?",
+                    (session_id, MESSAGE_WINDOW)
+                ).fetchall()
+            message_rows.reverse()
+            
+            created_at, updated_at, context, metadata, summary, summary_upto = row
+            session = ChatSession(
+                session_id=session_id,
+                created_at=datetime.fromisoformat(created_at),
+                updated_at=datetime.fromisoformat(updated_at),
+                messages=[
+                    Message(
+                        message_id=message_id,
+                        role=role,
+                        content=self._intern(ref, content) if ref else content,
+                        timestamp=datetime.fromisoformat(timestamp),
+                        metadata=orjson.loads(message_metadata)
+                    )
+                    for _, message_id, role, ref, content, timestamp, message_metadata in message_rows
+                ],
+                message_offset=message_rows[0][0] if message_rows else 0,
+                context=orjson.loads(context),
+                metadata=orjson.loads(metadata),
+                summary=summary,
+                summary_upto=summary_upto
+            )
+            self._cache_session(session)
             return session
         except Exception as e:
             print(f"Error loading session {session_id}: {e}")
             return None
     
-    def _save_session(self, session: ChatSession):
-        """Save a session to file"""
-        session_file = self._get_session_file(session.session_id)
-        try:
-            with open(session_file, 'w') as f:
-                json.dump(session.to_dict(), f, indent=2)
-        except Exception as e:
-            print(f"Error saving session {session.session_id}: {e}")
+    def _intern(self, ref: str, content: str) -> str:
+        """Return the shared string for a content blob"""
+        shared = self._interned.setdefault(ref, content)
+        if len(self._interned) > CONTENT_INTERN_SIZE:
+            del self._interned[next(iter(self._interned))]
+        return shared
+    
+    def _writer_loop(self):
+        """Write queued sessions in one transaction per batch, coalescing repeated updates"""
+        conn = connect_sessions_db(self.db_path)
+        while True:
+            batch = [self._write_queue.get()]
+            while True:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # Keep the latest session row per session, but every message row
+            session_rows: Dict[str, tuple] = {}
+            message_rows: List[tuple] = []
+            for session_id, session_row, rows in batch:
+                session_rows[session_id] = session_row
+                message_rows.extend(rows)
+            
+            try:
+                with conn:
+                    self._write_rows(conn, session_rows.values(), message_rows)
+            except Exception as e:
+                print(f"Error saving sessions {list(session_rows)}: {e}")
+            
+            with self._pending_done:
+                for session_id, _, _ in batch:
+                    remaining = self._pending_writes[session_id] - 1
+                    if remaining:
+                        self._pending_writes[session_id] = remaining
+                    else:
+                        del self._pending_writes[session_id]
+                self._pending_done.notify_all()
+            
+            for _ in batch:
+                self._write_queue.task_done()
+    
+    def flush(self):
+        """Block until every queued session has been written"""
+        self._write_queue.join()
+    
+    def mark_dirty(self, session: ChatSession):
+        """
+        Queue a write for a session already changed in memory
+        
+        Unlike update_session this leaves updated_at alone, since
+        ChatSession.add_message has already stamped it.
+        
+        Args:
+            session: Session whose changes should be persisted
+        """
+        self._cache_session(session)
+        self._queue_write(session)
     
     def update_session(self, session: ChatSession):
-        """Update an existing session"""
+        """Update an existing session (written in the background)"""
         session.updated_at = datetime.now()
-        self._save_session(session)
-        self._cache[session.session_id] = session
+        self.mark_dirty(session)
+    
+    def _delete_rows(self, session_ids: List[str]):
+        """Delete sessions and their messages from the database"""
+        params = [(session_id,) for session_id in session_ids]
+        with self._conn_lock, self._conn:
+            self._conn.executemany("DELETE FROM messages WHERE session_id = ?", params)
+            self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", params)
+            # Drop blobs no remaining message refers to
+            self._conn.execute(
+                "DELETE FROM content_blobs WHERE content_ref NOT IN "
+                "(SELECT content_ref FROM messages WHERE content_ref IS NOT NULL)"
+            )
     
     def delete_session(self, session_id: str) -> bool:
         """Delete a session"""
-        session_file = self._get_session_file(session_id)
-        if session_file.exists():
-            try:
-                session_file.unlink()
-                if session_id in self._cache:
-                    del self._cache[session_id]
-                return True
-            except Exception as e:
-                print(f"Error deleting session {session_id}: {e}")
+        # Make sure a queued write cannot recreate the session afterwards
+        self._wait_for_writes(session_id)
+        try:
+            with self._conn_lock:
+                exists = self._conn.execute(
+                    "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone() is not None
+            if not exists:
                 return False
-        return False
+            self._delete_rows([session_id])
+        except Exception as e:
+            print(f"Error deleting session {session_id}: {e}")
+            return False
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+        return True
     
     def add_message(self, session_id: str, message: Message) -> bool:
-        """Add a message to a session"""
+        """
+        Add a message to a session by id
+        
+        Deprecated: callers holding the session should use
+        `session.add_message(message)` followed by `mark_dirty(session)`,
+        which never touches the database to find the session.
+        """
         session = self.get_session(session_id)
         if not session:
             return False
         
         session.add_message(message)
-        self.update_session(session)
+        self.mark_dirty(session)
         return True
     
     def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Message]:
@@ -198,21 +644,29 @@ class SessionManager:
     
     def list_sessions(self) -> List[str]:
         """List all session IDs"""
-        return [f.stem for f in self.sessions_dir.glob("*.json")]
+        self.flush()
+        with self._conn_lock:
+            return [row[0] for row in self._conn.execute("SELECT session_id FROM sessions")]
     
     def cleanup_old_sessions(self, days: int = 7):
         """Delete sessions older than specified days"""
-        cutoff_time = datetime.now().timestamp() - (days * 24 * 60 * 60)
-        
-        for session_file in self.sessions_dir.glob("*.json"):
-            if session_file.stat().st_mtime < cutoff_time:
-                try:
-                    session_file.unlink()
-                    session_id = session_file.stem
-                    if session_id in self._cache:
-                        del self._cache[session_id]
-                except Exception as e:
-                    print(f"Error deleting old session {session_file}: {e}")
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        self.flush()
+        try:
+            with self._conn_lock:
+                stale = [
+                    row[0] for row in self._conn.execute(
+                        "SELECT session_id FROM sessions WHERE updated_at < ?", (cutoff,)
+                    )
+                ]
+            if stale:
+                self._delete_rows(stale)
+        except Exception as e:
+            print(f"Error deleting old sessions: {e}")
+            return
+        with self._cache_lock:
+            for session_id in stale:
+                self._cache.pop(session_id, None)
 
 
 # Global session manager instance
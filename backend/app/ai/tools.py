@@ -3,11 +3,40 @@ Tools registry for AI agent
 
 Defines all available tools (API functions) that the AI can call
 """
-from typing import Dict, List, Any, Callable, Optional
+import functools
+import inspect
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping, Sequence
+from types import MappingProxyType
+from typing import Dict, List, Any, Callable, Optional, Tuple, Union, get_args, get_origin, get_type_hints
+
+from app.config import settings
+from app.database import run_db, shared_connection
 from app.services import CollegeService
 
 
+# Maximum number of tool results kept in the in-process memo cache
+TOOL_CACHE_SIZE = 4096
+# Seconds a memoized tool result stays valid, so a dataset swapped in place is
+# picked up without a restart
+TOOL_CACHE_TTL_S = 3600.0
+
+
+# Tool functions for Gemini, in registration order
+TOOL_FUNCTIONS: List[Callable] = []
+
+
+def tool(func: Callable) -> Callable:
+    """Register a function as a tool the AI can call"""
+    TOOL_FUNCTIONS.append(func)
+    return func
+
+
 # Tool execution functions - these are the actual callable functions
+@tool
 def get_colleges_by_rank(rank: int, round: int = 1, limit: int = 10):
     """
     Find colleges where a student with given KCET rank can get admission.
@@ -18,24 +47,24 @@ def get_colleges_by_rank(rank: int, round: int = 1, limit: int = 10):
         round: Counselling round number (1, 2, or 3). Default is 1.
         limit: Maximum number of colleges to return (1-500). Default is 10.
     """
-    colleges = CollegeService.get_colleges_by_rank(
+    return CollegeService.get_colleges_by_rank(
         rank=rank,
         round=round,
         limit=limit,
         sort_order="asc"
     )
-    return colleges
 
 
+@tool
 def get_all_branches():
     """
     Get complete list of all available engineering branches in KCET 2024 data.
     Use this to discover what branches are available.
     """
-    branches = CollegeService.get_all_branches()
-    return branches
+    return CollegeService.get_all_branches()
 
 
+@tool
 def search_colleges(
     min_rank: Optional[int] = None,
     max_rank: Optional[int] = None,
@@ -54,7 +83,7 @@ def search_colleges(
         round: Counselling round (1, 2, or 3). Default is 1.
         limit: Maximum number of results (1-500)
     """
-    colleges = CollegeService.search_colleges(
+    return CollegeService.search_colleges(
         min_rank=min_rank,
         max_rank=max_rank,
         branches=branches,
@@ -62,9 +91,9 @@ def search_colleges(
         limit=limit,
         sort_order="asc"
     )
-    return colleges
 
 
+@tool
 def get_colleges_by_branch(branch: str, round: int = 1, limit: Optional[int] = None):
     """
     Get all colleges offering a specific branch, sorted by cutoff rank.
@@ -74,15 +103,15 @@ def get_colleges_by_branch(branch: str, round: int = 1, limit: Optional[int] = N
         round: Counselling round (1, 2, or 3). Default is 1.
         limit: Maximum number of colleges to return (1-500)
     """
-    colleges = CollegeService.get_colleges_by_branch(
+    return CollegeService.get_colleges_by_branch(
         branch=branch,
         round=round,
         limit=limit,
         sort_order="asc"
     )
-    return colleges
 
 
+@tool
 def get_cutoff_trends(college_code: str, branch: str):
     """
     Get cutoff rank trends across all 3 counselling rounds for a specific college and branch.
@@ -91,10 +120,10 @@ def get_cutoff_trends(college_code: str, branch: str):
         college_code: College code (e.g., 'E001', 'E002')
         branch: Branch name (e.g., 'Computer Science Engineering')
     """
-    trends = CollegeService.get_cutoff_trends(college_code, branch)
-    return trends
+    return CollegeService.get_cutoff_trends(college_code, branch)
 
 
+@tool
 def get_college_branches(college_code: str):
     """
     Get all branches offered by a specific college with their cutoff ranks for all rounds.
@@ -102,10 +131,10 @@ def get_college_branches(college_code: str):
     Args:
         college_code: College code (e.g., 'E001', 'E002')
     """
-    result = CollegeService.get_college_branches(college_code)
-    return result
+    return CollegeService.get_college_branches(college_code)
 
 
+@tool
 def search_college_by_name(query: str, limit: int = 10):
     """
     Search for colleges by name using fuzzy matching.
@@ -122,10 +151,10 @@ def search_college_by_name(query: str, limit: int = 10):
     Returns:
         List of dicts with college_code, college_name, match_score
     """
-    results = CollegeService.search_college_by_name(query, limit)
-    return results
+    return CollegeService.search_college_by_name(query, limit)
 
 
+@tool
 def match_branch_names(query: str, limit: int = 10):
     """
     Match user's casual branch name to exact database branch names.
@@ -140,10 +169,10 @@ def match_branch_names(query: str, limit: int = 10):
     Returns:
         List of dicts with exact branch_name and match_score
     """
-    results = CollegeService.match_branch_names(query, limit)
-    return results
+    return CollegeService.match_branch_names(query, limit)
 
 
+@tool
 def analyze_rank_prospects(rank: int, round: int = 1):
     """
     Analyze a student's rank and provide detailed statistics.
@@ -158,11 +187,11 @@ def analyze_rank_prospects(rank: int, round: int = 1):
     Returns:
         Dict with percentile, total_options, and categorized colleges
     """
-    analysis = CollegeService.analyze_rank_prospects(rank, round)
-    return analysis
+    return CollegeService.analyze_rank_prospects(rank, round)
 
 
-def compare_colleges(college_codes: List[str], round: int = 1):
+@tool
+def compare_colleges(college_codes: List[str], round: int = 1, include_branches: bool = True):
     """
     Compare 2-4 colleges side-by-side.
     Returns structured data optimized for frontend table rendering.
@@ -172,14 +201,16 @@ def compare_colleges(college_codes: List[str], round: int = 1):
     Args:
         college_codes: List of 2-4 college codes (e.g., ['E001', 'E005'])
         round: Counselling round (default: 1)
+        include_branches: Include every branch's cutoffs (default: True); set False
+            when only the best/average/worst cutoffs are needed
         
     Returns:
         Dict with comparison data for all colleges
     """
-    comparison = CollegeService.compare_colleges(college_codes, round)
-    return comparison
+    return CollegeService.compare_colleges(college_codes, round, include_branches)
 
 
+@tool
 def get_branch_popularity(branch_name: Optional[str] = None, round: int = 1):
     """
     Analyze branch popularity and competitiveness.
@@ -194,43 +225,331 @@ def get_branch_popularity(branch_name: Optional[str] = None, round: int = 1):
     Returns:
         Dict with branch statistics and competitiveness
     """
-    stats = CollegeService.get_branch_popularity(branch_name, round)
-    return stats
-
-
-# List of tool functions for Gemini
-TOOL_FUNCTIONS = [
-    get_colleges_by_rank,
-    get_all_branches,
-    search_colleges,
-    get_colleges_by_branch,
-    get_cutoff_trends,
-    get_college_branches,
-    search_college_by_name,
-    match_branch_names,
-    analyze_rank_prospects,
-    compare_colleges,
-    get_branch_popularity
-]
-
-
-# Mapping for execution by name
-TOOL_EXECUTORS: Dict[str, Callable] = {
-    "get_colleges_by_rank": get_colleges_by_rank,
-    "get_all_branches": get_all_branches,
-    "search_colleges": search_colleges,
-    "get_colleges_by_branch": get_colleges_by_branch,
-    "get_cutoff_trends": get_cutoff_trends,
-    "get_college_branches": get_college_branches,
-    "search_college_by_name": search_college_by_name,
-    "match_branch_names": match_branch_names,
-    "analyze_rank_prospects": analyze_rank_prospects,
-    "compare_colleges": compare_colleges,
-    "get_branch_popularity": get_branch_popularity,
-}
+    return CollegeService.get_branch_popularity(branch_name, round)
+
+
+# JSON schema types for tool parameter annotations
+_SCHEMA_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+# "    name: description" lines inside a docstring Args block
+_ARG_LINE = re.compile(r"^\s*(\w+)\s*:\s*(.+)$")
+_SECTION_HEADER = re.compile(r"^(Args|Returns|Raises|Yields|Example|Examples):\s*$")
+
+
+def _annotation_schema(annotation: Any) -> Dict[str, Any]:
+    """Convert a parameter annotation into a JSON schema fragment"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        members = [arg for arg in get_args(annotation) if arg is not type(None)]
+        schema = _annotation_schema(members[0])
+        if len(members) < len(get_args(annotation)):
+            schema["nullable"] = True
+        return schema
+    if origin in (list, List):
+        (item,) = get_args(annotation) or (str,)
+        return {"type": "array", "items": _annotation_schema(item)}
+    return {"type": _SCHEMA_TYPES.get(annotation, "string")}
+
+
+def _build_schema(func: Callable) -> Dict[str, Any]:
+    """
+    Build a Gemini function declaration from a tool's signature and docstring
+    
+    The docstring's Args block becomes per-parameter descriptions; the rest
+    of the docstring is the function description.
+    """
+    description_lines = []
+    arg_descriptions: Dict[str, str] = {}
+    section = None
+    last_arg, arg_indent = None, 0
+    for line in inspect.cleandoc(func.__doc__ or "").splitlines():
+        header = _SECTION_HEADER.match(line.strip())
+        if header:
+            section = header.group(1)
+            if section != "Args":
+                description_lines.append(line)
+            continue
+        if section == "Args":
+            indent = len(line) - len(line.lstrip())
+            if last_arg and indent > arg_indent and line.strip():
+                # Wrapped description: continues the previous argument
+                arg_descriptions[last_arg] += " " + line.strip()
+                continue
+            match = _ARG_LINE.match(line)
+            if match:
+                last_arg, arg_indent = match.group(1), indent
+                arg_descriptions[last_arg] = match.group(2).strip()
+            continue
+        description_lines.append(line)
+    
+    hints = get_type_hints(func)
+    properties = {}
+    required = []
+    for name, param in inspect.signature(func).parameters.items():
+        schema = _annotation_schema(hints.get(name, str))
+        if name in arg_descriptions:
+            schema["description"] = arg_descriptions[name]
+        properties[name] = schema
+        if param.default is inspect.Parameter.empty:
+            required.append(name)
+    
+    declaration: Dict[str, Any] = {
+        "name": func.__name__,
+        "description": "\n".join(description_lines).strip(),
+    }
+    if properties:
+        declaration["parameters"] = {"type": "object", "properties": properties, "required": required}
+    return declaration
+
+
+# Function declarations for Gemini, built once at import
+TOOL_SCHEMAS: List[Dict[str, Any]] = [_build_schema(func) for func in TOOL_FUNCTIONS]
+
+
+def _compile_checker(name: str, schema: Dict[str, Any]) -> Callable[[Any], Any]:
+    """
+    Build a function that validates one parameter value against its schema
+    
+    Checkers return the value converted to its Python type: Gemini sends every
+    number as a float and arrays as protobuf repeated fields.
+    """
+    nullable = schema.get("nullable", False)
+    schema_type = schema["type"]
+    
+    if schema_type == "integer":
+        def check_type(value):
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+            raise ValueError(f"'{name}' must be an integer, got {value!r}")
+    elif schema_type == "number":
+        def check_type(value):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return value
+            raise ValueError(f"'{name}' must be a number, got {value!r}")
+    elif schema_type == "boolean":
+        def check_type(value):
+            if isinstance(value, bool):
+                return value
+            raise ValueError(f"'{name}' must be a boolean, got {value!r}")
+    elif schema_type == "array":
+        check_item = _compile_checker(f"{name}[]", schema["items"])
+        
+        def check_type(value):
+            if isinstance(value, (str, bytes, Mapping)) or not isinstance(value, Iterable):
+                raise ValueError(f"'{name}' must be a list, got {value!r}")
+            return [check_item(item) for item in value]
+    else:
+        def check_type(value):
+            if isinstance(value, str):
+                return value
+            raise ValueError(f"'{name}' must be a string, got {value!r}")
+    
+    if not nullable:
+        return check_type
+    return lambda value: None if value is None else check_type(value)
+
+
+def _compile_validator(schema: Dict[str, Any]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Build a validator for a tool's parameters from its function declaration"""
+    parameters = schema.get("parameters", {})
+    checkers = {
+        name: _compile_checker(name, property_schema)
+        for name, property_schema in parameters.get("properties", {}).items()
+    }
+    required = tuple(parameters.get("required", ()))
+    
+    def validate(params: Dict[str, Any]) -> Dict[str, Any]:
+        unknown = params.keys() - checkers.keys()
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+        missing = [name for name in required if name not in params]
+        if missing:
+            raise ValueError(f"Missing required parameters: {', '.join(missing)}")
+        return {name: checkers[name](value) for name, value in params.items()}
+    
+    return validate
+
+
+# Parameter validators per tool, compiled once from TOOL_SCHEMAS. Malformed
+# calls from the model are rejected before they reach the database.
+TOOL_VALIDATORS: Mapping[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = MappingProxyType({
+    schema["name"]: _compile_validator(schema) for schema in TOOL_SCHEMAS
+})
+
+
+# Dispatch table used by execute_tool; a plain dict lookup is about twice as
+# fast as going through the read-only proxy below
+_DISPATCH: Dict[str, Callable] = {func.__name__: func for func in TOOL_FUNCTIONS}
 
+# Mapping for execution by name (read-only; derived from TOOL_FUNCTIONS)
+TOOL_EXECUTORS: Mapping[str, Callable] = MappingProxyType(_DISPATCH)
 
+# Tools whose results are a pure function of their parameters and the static
+# dataset; only these are memoized. Leave out any tool that reads live state.
+CACHEABLE_TOOLS = frozenset(TOOL_EXECUTORS)
+
+# Failure summaries; the templates are parsed once and only substituted per call
+_UNKNOWN_TOOL_ERROR = "Unknown tool: {}".format
+_UNKNOWN_TOOL_SUMMARY = "Tool '{}' not found".format
+_ERROR_SUMMARY = "Error executing {}: {}".format
+
+# Success summaries per tool, formatted once at import
+_SUCCESS_SUMMARIES: Mapping[str, str] = MappingProxyType({
+    tool_name: f"Successfully fetched data using {tool_name}" for tool_name in TOOL_EXECUTORS
+})
+
+
+def _canonicalize(value: Any) -> Any:
+    """Normalize tool parameters into a hashable form so equivalent calls share a cache key"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, Mapping):
+        return tuple(sorted((str(k), _canonicalize(v)) for k, v in value.items()))
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        return tuple(_canonicalize(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
 
+
+def _fold_text(value: Any) -> Any:
+    """Case- and whitespace-fold a text parameter the service compares case-insensitively"""
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def _fold_branch_list(value: Any) -> Any:
+    """Branch filters are matched with a case-insensitive IN, so order and duplicates don't matter"""
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        return sorted({branch.lower() for branch in value if isinstance(branch, str)})
+    return value
+
+
+# Parameters whose spelling variants produce identical results, so they are
+# folded before keying the memo cache. Only parameters the services already
+# normalize belong here; get_branch_popularity echoes branch_name back as given.
+_KEY_FOLDS: Mapping[str, Mapping[str, Callable[[Any], Any]]] = MappingProxyType({
+    "get_colleges_by_branch": {"branch": _fold_text},
+    "get_cutoff_trends": {"branch": _fold_text},
+    "search_colleges": {"branches": _fold_branch_list},
+    "search_college_by_name": {"query": _fold_text},
+    "match_branch_names": {"query": _fold_text},
+})
+
+# Signatures used to fill in omitted defaults, so {"rank": 5000} and
+# {"rank": 5000, "round": 1} share a cache entry
+_SIGNATURES: Mapping[str, inspect.Signature] = MappingProxyType({
+    func.__name__: inspect.signature(func) for func in TOOL_FUNCTIONS
+})
+
+
+def _tool_cache_key(tool_name: str, parameters: Dict[str, Any]) -> tuple:
+    """Build a cache key for a tool call, scoped to the dataset version"""
+    signature = _SIGNATURES.get(tool_name)
+    if signature is not None:
+        try:
+            bound = signature.bind(**parameters)
+        except TypeError:
+            pass  # Invalid call; the tool itself will report the error
+        else:
+            bound.apply_defaults()
+            parameters = bound.arguments
+    
+    folds = _KEY_FOLDS.get(tool_name)
+    if folds:
+        parameters = {
+            name: folds[name](value) if name in folds else value
+            for name, value in parameters.items()
+        }
+    return (settings.DATA_VERSION, tool_name, _canonicalize(parameters))
+
+
+def memoize_tool(func: Callable) -> Callable:
+    """
+    Memoize successful tool results in a bounded LRU cache with a TTL
+    
+    Tools in CACHEABLE_TOOLS are read-only queries over the static KCET
+    dataset, so identical calls always produce identical results. Failed
+    calls are never cached. Hits return the shared result dict, which
+    callers must treat as read-only; values derived from a result are kept
+    beside it with cache_derived() instead.
+    """
+    # key -> (expires_at, result, values derived from result by builder)
+    cache: "OrderedDict[tuple, Tuple[float, Dict[str, Any], Dict[Callable, Any]]]" = OrderedDict()
+    # Tools may run concurrently in worker threads
+    lock = threading.Lock()
+    
+    def lookup(key: tuple, now: float) -> Optional[Dict[str, Any]]:
+        with lock:
+            cached = cache.get(key)
+            if cached is not None:
+                expires_at, result, _ = cached
+                if now < expires_at:
+                    cache.move_to_end(key)
+                    return result
+                del cache[key]
+        return None
+    
+    def cache_lookup(tool_name: str, parameters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a fresh memoized result without executing the tool"""
+        if tool_name not in CACHEABLE_TOOLS:
+            return None
+        return lookup(_tool_cache_key(tool_name, parameters), time.monotonic())
+    
+    def cache_derived(
+        tool_name: str,
+        parameters: Dict[str, Any],
+        result: Dict[str, Any],
+        build: Callable[[Dict[str, Any]], Any],
+    ) -> Any:
+        """
+        Return build(result), computed once per cache entry for memoized results
+        
+        Results that are not the current cache entry for the call (failures,
+        uncacheable tools, evicted entries) are built every time.
+        """
+        cached = None
+        if tool_name in CACHEABLE_TOOLS:
+            key = _tool_cache_key(tool_name, parameters)
+            with lock:
+                cached = cache.get(key)
+        if cached is None or cached[1] is not result:
+            return build(result)
+        derived = cached[2]
+        value = derived.get(build)
+        if value is None:
+            value = derived[build] = build(result)
+        return value
+    
+    @functools.wraps(func)
+    def wrapper(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        if tool_name not in CACHEABLE_TOOLS:
+            return func(tool_name, parameters)
+        
+        key = _tool_cache_key(tool_name, parameters)
+        now = time.monotonic()
+        result = lookup(key, now)
+        if result is not None:
+            return result
+        
+        result = func(tool_name, parameters)
+        if result["success"]:
+            with lock:
+                cache[key] = (now + TOOL_CACHE_TTL_S, result, {})
+                if len(cache) > TOOL_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return result
+    
+    wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+    wrapper.cache_lookup = cache_lookup  # type: ignore[attr-defined]
+    wrapper.cache_derived = cache_derived  # type: ignore[attr-defined]
+    return wrapper
+
+
+@memoize_tool
 def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
     """
     Execute a tool by name with given parameters
@@ -242,24 +561,67 @@ def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Dictionary with success status, data/error, and summary
     """
-    executor = TOOL_EXECUTORS.get(tool_name)
+    executor = _DISPATCH.get(tool_name)
     if not executor:
         return {
             "success": False,
-            "error": f"Unknown tool: {tool_name}",
-            "summary": f"Tool '{tool_name}' not found"
+            "error": _UNKNOWN_TOOL_ERROR(tool_name),
+            "summary": _UNKNOWN_TOOL_SUMMARY(tool_name)
         }
     
     try:
-        result = executor(**parameters)
+        result = executor(**TOOL_VALIDATORS[tool_name](parameters))
         return {
             "success": True,
             "data": result,
-            "summary": f"Successfully fetched data using {tool_name}"
+            "summary": _SUCCESS_SUMMARIES[tool_name]
         }
     except Exception as e:
+        error = str(e)
         return {
             "success": False,
-            "error": str(e),
-            "summary": f"Error executing {tool_name}: {str(e)}"
+            "error": error,
+            "summary": _ERROR_SUMMARY(tool_name, error)
         }
+
+
+def execute_tools_batch(calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Execute several tool calls on one pooled database connection
+    
+    Args:
+        calls: (tool_name, parameters) pairs, e.g. parallel function calls
+            from a single model response
+        
+    Returns:
+        Results in the same order as calls
+    """
+    with shared_connection():
+        return [execute_tool(tool_name, parameters) for tool_name, parameters in calls]
+
+
+async def aexecute_tools(calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Execute tool calls without blocking the event loop
+    
+    Memoized results are returned directly; the remaining calls run in a
+    worker thread, sharing one connection when there are several.
+    
+    Args:
+        calls: (tool_name, parameters) pairs from one model response
+        
+    Returns:
+        Results in the same order as calls
+    """
+    results: List[Optional[Dict[str, Any]]] = [
+        execute_tool.cache_lookup(tool_name, parameters) for tool_name, parameters in calls
+    ]
+    pending = [index for index, result in enumerate(results) if result is None]
+    if len(pending) == 1:
+        index = pending[0]
+        results[index] = await run_db(execute_tool, *calls[index])
+    elif pending:
+        fetched = await run_db(execute_tools_batch, [calls[index] for index in pending])
+        for index, result in zip(pending, fetched):
+            results[index] = result
+    return results
@@ -0,0 +1,357 @@
+"""
+In-memory column store of KCET cutoff ranks
+
+The dataset is small and static, so each round's cutoffs are loaded once into
+a sorted integer array with the matching rows alongside it. Rank filters then
+become a binary search and a slice instead of a full table scan and sort.
+The whole table is also kept column-wise (one tuple per column) so branch and
+multi-filter searches are answered without a SQLite round-trip.
+"""
+import functools
+import heapq
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.database import execute_query
+
+
+# Columns of a college row, in the order SQL returns them
+COLLEGE_COLUMNS = ("college_code", "college_name", "branch_name", "cutoff_rank")
+
+# Case folding of SQLite's NOCASE collation (ASCII letters only)
+_NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def fold_nocase(text: str) -> str:
+    """Fold text the way SQLite's NOCASE collation compares it"""
+    return text.translate(_NOCASE)
+
+
+def _is_int(value) -> bool:
+    """True for plain ints (bools and other numbers take the SQL path)"""
+    return type(value) is int
+
+
+class RoundColumns:
+    """Rows with a cutoff in one round, sorted by cutoff in both directions"""
+
+    __slots__ = ("ascending", "ascending_rows", "descending_rows")
+
+    def __init__(self, rows: List[Tuple]):
+        """
+        Build the sorted columns for a round
+
+        Args:
+            rows: (college_code, college_name, branch_name, cutoff_rank) tuples in
+                table order; ties keep this order, as they do in SQLite's sort
+        """
+        ascending_rows = sorted(rows, key=lambda row: row[3])
+        self.ascending = array("q", (row[3] for row in ascending_rows))
+        self.ascending_rows = tuple(ascending_rows)
+        self.descending_rows = tuple(sorted(rows, key=lambda row: -row[3]))
+
+    def at_least(self, rank: int, limit: Optional[int], descending: bool) -> List[Tuple]:
+        """
+        Rows whose cutoff is >= rank
+
+        Args:
+            rank: Minimum cutoff rank
+            limit: Maximum number of rows (None for all)
+            descending: Worst cutoffs first instead of best first
+
+        Returns:
+            Matching row tuples in sort order
+        """
+        start = bisect_left(self.ascending, rank)
+        if descending:
+            count = len(self.ascending) - start
+            if limit is not None:
+                count = min(count, limit)
+            return list(self.descending_rows[:count])
+        stop = None if limit is None else start + limit
+        return list(self.ascending_rows[start:stop])
+    
+    def margin_bands(self, rank: int, margins: Sequence[int]) -> List[Tuple[Tuple, ...]]:
+        """
+        Split rows with cutoff >= rank into bands by how far the cutoff is above rank
+        
+        Args:
+            rank: Minimum cutoff rank
+            margins: Ascending upper bounds (inclusive) of cutoff - rank per band
+            
+        Returns:
+            len(margins) + 1 bands of row tuples, best cutoffs first; the last
+            band holds everything beyond the largest margin
+        """
+        bounds = [bisect_left(self.ascending, rank)]
+        bounds.extend(bisect_right(self.ascending, rank + margin) for margin in margins)
+        bounds.append(len(self.ascending))
+        rows = self.ascending_rows
+        return [rows[start:stop] for start, stop in zip(bounds, bounds[1:])]
+
+
+class CutoffColumns:
+    """Per-round cutoff columns for the whole dataset"""
+
+    def __init__(self):
+        rows = execute_query(
+            "SELECT college_code, college_name, branch_name, GM_rank_r1, GM_rank_r2, GM_rank_r3 "
+            "FROM kcet_2024 ORDER BY rowid",
+            as_dict=False
+        )
+        # One shared string per distinct code, name and branch (each repeats on
+        # many rows), so the columns hold references and lookups hash them once
+        rows = [
+            (sys.intern(row[0]), sys.intern(row[1]), sys.intern(row[2]), row[3], row[4], row[5])
+            for row in rows
+        ]
+        self.rounds: Dict[int, RoundColumns] = {
+            round: RoundColumns([
+                (row[0], row[1], row[2], row[column])
+                for row in rows if row[column] is not None
+            ])
+            for round, column in ((1, 3), (2, 4), (3, 5))
+        }
+        
+        # The full table, column-wise and in rowid order
+        self.codes = tuple(row[0] for row in rows)
+        self.names = tuple(row[1] for row in rows)
+        self.branches = tuple(row[2] for row in rows)
+        folded = {branch: sys.intern(fold_nocase(branch)) for branch in set(self.branches)}
+        self.folded_branches = tuple(folded[branch] for branch in self.branches)
+        self.cutoffs: Dict[int, Tuple[Optional[int], ...]] = {
+            round: tuple(row[column] for row in rows)
+            for round, column in ((1, 3), (2, 4), (3, 5))
+        }
+        
+        # Row indices per folded branch name and per college code, in rowid order
+        branch_rows: Dict[str, List[int]] = {}
+        code_rows: Dict[str, List[int]] = {}
+        for index, (code, folded) in enumerate(zip(self.codes, self.folded_branches)):
+            branch_rows.setdefault(folded, []).append(index)
+            code_rows.setdefault(code, []).append(index)
+        self.branch_rows = {key: tuple(indices) for key, indices in branch_rows.items()}
+        self.code_rows = {key: tuple(indices) for key, indices in code_rows.items()}
+        
+        # Row index of each (college_code, branch_name), for search cursors
+        self.row_index = {row: index for index, row in enumerate(zip(self.codes, self.branches))}
+    
+    def _sort_key(self, round: int, descending: bool):
+        """
+        Sort key of a row index, ordering rows like the SQL queries
+        
+        Rows are sorted by cutoff with ties in rowid order (sorting is stable);
+        missing cutoffs sort first ascending and last descending, as NULLs do
+        in SQLite.
+        """
+        cutoffs = self.cutoffs[round]
+        if descending:
+            return lambda index: (cutoffs[index] is None, -(cutoffs[index] or 0))
+        return lambda index: (cutoffs[index] is not None, cutoffs[index] or 0)
+    
+    def _sorted_rows(
+        self,
+        indices: Iterable[int],
+        round: int,
+        limit: Optional[int],
+        descending: bool
+    ) -> List[Dict]:
+        """College dicts for the given row indices, ordered like the SQL queries (see _sort_key)"""
+        cutoffs = self.cutoffs[round]
+        key = self._sort_key(round, descending)
+        if limit is None:
+            ordered = sorted(indices, key=key)
+        else:
+            # Partial selection; same result (and tie order) as sorted()[:limit]
+            ordered = heapq.nsmallest(limit, indices, key=key)
+        codes, names, branches = self.codes, self.names, self.branches
+        return [
+            {
+                "college_code": codes[index],
+                "college_name": names[index],
+                "branch_name": branches[index],
+                "cutoff_rank": cutoffs[index],
+            }
+            for index in ordered
+        ]
+
+    def colleges_by_rank(
+        self,
+        rank: int,
+        round: int,
+        limit: Optional[int],
+        descending: bool
+    ) -> Optional[List[Dict]]:
+        """
+        Colleges accessible at a rank, as get_colleges_by_rank's SQL returns them
+
+        Returns:
+            List of college dicts, or None if the arguments need the SQL path
+        """
+        columns = self.rounds.get(round)
+        if columns is None or type(rank) is not int:
+            return None
+        if limit is not None and (type(limit) is not int or limit < 0):
+            return None
+        return [dict(zip(COLLEGE_COLUMNS, row)) for row in columns.at_least(rank, limit, descending)]
+    
+    def colleges_by_branch(
+        self,
+        branch: str,
+        round: int,
+        limit: Optional[int],
+        descending: bool
+    ) -> Optional[List[Dict]]:
+        """
+        Colleges offering a branch, as get_colleges_by_branch's SQL returns them
+        
+        Returns:
+            List of college dicts, or None if the arguments need the SQL path
+        """
+        if round not in self.cutoffs or not isinstance(branch, str):
+            return None
+        if limit is not None and (not _is_int(limit) or limit < 0):
+            return None
+        indices = self.branch_rows.get(fold_nocase(branch), ())
+        return self._sorted_rows(indices, round, limit, descending)
+    
+    def _search_indices(
+        self,
+        min_rank: Optional[int],
+        max_rank: Optional[int],
+        branches: Optional[Sequence[str]],
+        round: int
+    ) -> Optional[Sequence[int]]:
+        """Row indices matching search_colleges' filters in rowid order, or None for the SQL path"""
+        if round not in self.cutoffs:
+            return None
+        if any(value is not None and not _is_int(value) for value in (min_rank, max_rank)):
+            return None
+        if branches and not all(isinstance(branch, str) for branch in branches):
+            return None
+        
+        cutoffs = self.cutoffs[round]
+        # Start from the rows of the requested branches (rowid order keeps ties
+        # stable), then apply the rank filters in one pass
+        if branches:
+            branch_rows = self.branch_rows
+            candidates: Sequence[int] = sorted({
+                index
+                for folded in {fold_nocase(branch) for branch in branches}
+                for index in branch_rows.get(folded, ())
+            })
+        else:
+            candidates = range(len(cutoffs))
+        
+        if min_rank is None and max_rank is None:
+            return candidates
+        return [
+            index for index in candidates
+            if cutoffs[index] is not None
+            and (min_rank is None or cutoffs[index] >= min_rank)
+            and (max_rank is None or cutoffs[index] <= max_rank)
+        ]
+    
+    def search(
+        self,
+        min_rank: Optional[int],
+        max_rank: Optional[int],
+        branches: Optional[Sequence[str]],
+        round: int,
+        limit: Optional[int],
+        descending: bool,
+        after: Optional[Tuple[str, str]] = None
+    ) -> Optional[List[Dict]]:
+        """
+        Colleges matching search_colleges' filters, as its SQL returns them
+        
+        Args:
+            after: (college_code, branch_name) of the last row of the previous
+                page; only rows sorting after it are returned
+        
+        Returns:
+            List of college dicts, or None if the arguments need the SQL path
+        """
+        if limit is not None and (not _is_int(limit) or limit < 0):
+            return None
+        indices = self._search_indices(min_rank, max_rank, branches, round)
+        if indices is None:
+            return None
+        
+        if after is not None:
+            anchor = self.row_index.get(tuple(after))
+            if anchor is None:
+                return []
+            key = self._sort_key(round, descending)
+            anchor_key = (key(anchor), anchor)
+            indices = [index for index in indices if (key(index), index) > anchor_key]
+        return self._sorted_rows(indices, round, limit, descending)
+    
+    def count_by_rank(self, rank: int, round: int) -> Optional[int]:
+        """Number of rows colleges_by_rank matches without a limit (None for the SQL path)"""
+        columns = self.rounds.get(round)
+        if columns is None or not _is_int(rank):
+            return None
+        return len(columns.ascending) - bisect_left(columns.ascending, rank)
+    
+    def count_by_branch(self, branch: str, round: int) -> Optional[int]:
+        """Number of rows colleges_by_branch matches without a limit (None for the SQL path)"""
+        if round not in self.cutoffs or not isinstance(branch, str):
+            return None
+        return len(self.branch_rows.get(fold_nocase(branch), ()))
+    
+    def count_search(
+        self,
+        min_rank: Optional[int],
+        max_rank: Optional[int],
+        branches: Optional[Sequence[str]],
+        round: int
+    ) -> Optional[int]:
+        """Number of rows search matches without a limit (None for the SQL path)"""
+        indices = self._search_indices(min_rank, max_rank, branches, round)
+        return None if indices is None else len(indices)
+    
+    def college_rows(self, college_code: str) -> Optional[List[Dict]]:
+        """
+        A college's rows, as SELECT college_name, branch_name, GM_rank_r1,
+        GM_rank_r2, GM_rank_r3 ... WHERE college_code = ? returns them
+        
+        Returns:
+            List of row dicts in table order (empty if the code is unknown), or
+            None if the arguments need the SQL path
+        """
+        if not isinstance(college_code, str):
+            return None
+        names, branches = self.names, self.branches
+        r1, r2, r3 = self.cutoffs[1], self.cutoffs[2], self.cutoffs[3]
+        return [
+            {
+                "college_name": names[index],
+                "branch_name": branches[index],
+                "GM_rank_r1": r1[index],
+                "GM_rank_r2": r2[index],
+                "GM_rank_r3": r3[index],
+            }
+            for index in self.code_rows.get(college_code, ())
+        ]
+    
+    def margin_bands(self, rank: int, round: int, margins: Sequence[int]) -> Optional[List[Tuple[Tuple, ...]]]:
+        """
+        Rows accessible at a rank, banded by cutoff margin (see RoundColumns.margin_bands)
+        
+        Returns:
+            Bands of (college_code, college_name, branch_name, cutoff_rank) tuples,
+            or None if the arguments need the SQL path
+        """
+        columns = self.rounds.get(round)
+        if columns is None or type(rank) is not int:
+            return None
+        return columns.margin_bands(rank, margins)
+
+
+@functools.lru_cache(maxsize=1)
+def cutoff_columns() -> CutoffColumns:
+    """Load the column store on first use (once per process)"""
+    return CutoffColumns()
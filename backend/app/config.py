@@ -1,8 +1,20 @@
 """
 Configuration settings for the KCET College Predictor API
 """
+import functools
 import os
-from typing import List
+from typing import Tuple
+
+from dotenv import find_dotenv, load_dotenv
+
+
+@functools.lru_cache(maxsize=1)
+def load_env() -> bool:
+    """Load environment variables from the nearest .env file (once per process)"""
+    return load_dotenv(find_dotenv())
+
+
+load_env()
 
 
 class Settings:
@@ -18,11 +30,22 @@ class Settings:
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "data/kcet_2024.db")
+    # Bump when the KCET dataset is refreshed to invalidate cached tool results
+    DATA_VERSION: str = os.getenv("DATA_VERSION", "2024")
+    # Give every pooled connection a private in-memory copy of the database
+    INMEMORY_DB: bool = os.getenv("INMEMORY_DB", "1").lower() not in ("0", "false", "no")
+    # Serve rank filters from the in-memory column store instead of SQLite
+    COLUMN_STORE: bool = os.getenv("COLUMN_STORE", "1").lower() not in ("0", "false", "no")
     
     # CORS Settings
-    CORS_ORIGINS: List[str] = ["*"]
-    CORS_METHODS: List[str] = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-    CORS_HEADERS: List[str] = ["*"]
+    CORS_ORIGINS: Tuple[str, ...] = ("*",)
+    CORS_METHODS: Tuple[str, ...] = ("*",)
+    CORS_HEADERS: Tuple[str, ...] = ("*",)
+    
+    # Logging
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    # Hand log records to a background thread so handlers never block the event loop
+    LOG_QUEUE: bool = os.getenv("LOG_QUEUE", "1").lower() not in ("0", "false", "no")
     
     # API Settings
     DEFAULT_ROUND: int = int(os.getenv("DEFAULT_ROUND", "1"))
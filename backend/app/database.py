@@ -1,19 +1,150 @@
 """
 Database connection and query utilities
 """
+import asyncio
+import atexit
+import functools
+import queue
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator, List, Dict, Optional, Tuple
-from fastapi import HTTPException
+from typing import Any, Callable, Generator, List, Optional, Tuple
 
 from app.config import settings
 from app.exceptions import DatabaseError
 
 
+# Idle connections kept open for reuse; LIFO so the warmest connection is reused first
+POOL_SIZE = 8
+_POOL: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Threads for blocking database work started from the event loop, one per
+# pooled connection; kept apart from the default threadpool so queries are
+# never queued behind unrelated blocking work (and vice versa)
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="db")
+
+# Compiled statements each connection keeps; the services issue a small fixed
+# set of SQL templates, so pooled connections never re-parse them
+STATEMENT_CACHE_SIZE = 256
+
+# Applied once per connection. The KCET database is a static, committed file that
+# the API only reads, so the journal mode is left alone and writes are refused.
+CONNECTION_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Only meaningful when reading the file itself; an in-memory copy has no file
+# to map and never evicts pages
+FILE_CONNECTION_PRAGMAS = (
+    "PRAGMA cache_size=-65536",       # 64 MiB page cache
+    "PRAGMA mmap_size=268435456",     # Serve reads from a 256 MiB memory map
+)
+
+
+# Indexes built on the in-memory template (the committed file is never modified).
+# One per round's cutoff column for rank range scans, one per round on
+# (branch, cutoff) so a branch's rows come back already sorted (the branch is
+# matched case-insensitively, like the queries), plus college code lookups.
+# The code index also carries every column the per-college lookups select, so
+# they are answered from the index alone; the branch indexes stay narrow, as
+# extra columns would split their (cutoff, rowid) order and add a sort.
+IN_MEMORY_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_r1 ON kcet_2024 (GM_rank_r1);
+CREATE INDEX IF NOT EXISTS idx_r2 ON kcet_2024 (GM_rank_r2);
+CREATE INDEX IF NOT EXISTS idx_r3 ON kcet_2024 (GM_rank_r3);
+CREATE INDEX IF NOT EXISTS idx_branch_r1 ON kcet_2024 (branch_name COLLATE NOCASE, GM_rank_r1);
+CREATE INDEX IF NOT EXISTS idx_branch_r2 ON kcet_2024 (branch_name COLLATE NOCASE, GM_rank_r2);
+CREATE INDEX IF NOT EXISTS idx_branch_r3 ON kcet_2024 (branch_name COLLATE NOCASE, GM_rank_r3);
+CREATE INDEX IF NOT EXISTS idx_code ON kcet_2024 (
+    college_code, branch_name, GM_rank_r1, GM_rank_r2, GM_rank_r3, college_name
+);
+ANALYZE;
+"""
+
+# Serializes backups out of the template connection
+_template_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _in_memory_template() -> sqlite3.Connection:
+    """
+    Build the indexed in-memory copy of the database (once per process)
+    
+    Pooled connections are copied from it, so the file is read and the
+    indexes and statistics are built only once.
+    """
+    template = sqlite3.connect(":memory:", check_same_thread=False)
+    source = sqlite3.connect(f"file:{settings.DATABASE_URL}?mode=ro", uri=True)
+    try:
+        source.backup(template)
+    finally:
+        source.close()
+    template.executescript(IN_MEMORY_INDEXES)
+    return template
+
+
+def _connect() -> sqlite3.Connection:
+    """Open and configure a new connection to the KCET database"""
+    conn = sqlite3.connect(
+        ":memory:" if settings.INMEMORY_DB else settings.DATABASE_URL,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    if settings.INMEMORY_DB:
+        # Copy the whole (small, read-only) database into this connection so
+        # queries never go through the file system
+        template = _in_memory_template()
+        with _template_lock:
+            template.backup(conn)
+    else:
+        for pragma in FILE_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+    conn.row_factory = sqlite3.Row  # This enables column access by name
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def close_pool():
+    """Close every idle pooled connection"""
+    while True:
+        try:
+            _POOL.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+atexit.register(close_pool)
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking database call on DB_EXECUTOR without blocking the event loop
+    
+    Args:
+        func: Function doing the database work (e.g. a CollegeService method)
+        *args, **kwargs: Arguments passed to func
+        
+    Returns:
+        Whatever func returns (its exceptions are raised here)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+# Connection pinned to the current thread by shared_connection()
+_local = threading.local()
+
+
 @contextmanager
 def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
     """
-    Context manager for database connections
+    Context manager for pooled database connections
+    
+    Connections are opened once and returned to the pool afterwards instead of
+    being closed, so queries skip the open and page-cache warm-up.
     
     Yields:
         sqlite3.Connection: Database connection with row factory enabled
@@ -21,41 +152,102 @@ def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
     Raises:
         DatabaseError: If database connection or operation fails
     """
+    pinned = getattr(_local, "conn", None)
+    if pinned is not None:
+        try:
+            yield pinned
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Database error: {str(e)}")
+        return
+    
     conn = None
     try:
-        conn = sqlite3.connect(settings.DATABASE_URL)
-        conn.row_factory = sqlite3.Row  # This enables column access by name
+        try:
+            conn = _POOL.get_nowait()
+        except queue.Empty:
+            conn = _connect()
         yield conn
     except sqlite3.Error as e:
+        # Don't reuse a connection that may be in a bad state
+        if conn:
+            conn.close()
+            conn = None
         raise DatabaseError(f"Database error: {str(e)}")
     finally:
         if conn:
-            conn.close()
+            try:
+                _POOL.put_nowait(conn)
+            except queue.Full:
+                conn.close()
 
 
-def execute_query(query: str, params: Optional[Tuple] = None) -> List[Dict]:
+def execute_query(query: str, params: Optional[Tuple] = None, as_dict: bool = True) -> List:
     """
     Execute a SQL query and return results as a list of dictionaries
     
     Args:
         query: SQL query string
         params: Optional tuple of query parameters
+        as_dict: Convert rows to dicts; pass False to get the sqlite3.Row objects
+            (index and name access) when the caller only reads fields
         
     Returns:
-        List of dictionaries representing query results
+        List of dictionaries (or sqlite3.Row objects) representing query results
         
     Raises:
-        HTTPException: If database error occurs (500 status)
+        DatabaseError: If the query fails (rendered as a 500 by the app's handler)
     """
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            return [dict(row) for row in cursor.fetchall()]
-    except DatabaseError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Internal server error")
+    with get_db_connection() as conn:
+        # conn.execute reuses the connection's compiled statement for this SQL text
+        rows = conn.execute(query, params or ()).fetchall()
+    if not as_dict:
+        return rows
+    return [dict(row) for row in rows]
+
+
+# Tables the API reads on hot paths
+HOT_TABLES = ("kcet_2024",)
+
+
+def warmup():
+    """
+    Fill the pool and page in the hot tables before serving traffic
+    
+    Opens one connection per pool slot and scans each hot table on them, so
+    the first requests after startup read from memory rather than disk.
+    """
+    connections = [_connect() for _ in range(POOL_SIZE)]
+    for conn in connections:
+        for table in HOT_TABLES:
+            conn.execute(f"SELECT * FROM {table}").fetchall()
+    for conn in connections:
+        try:
+            _POOL.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+@contextmanager
+def shared_connection() -> Generator[sqlite3.Connection, None, None]:
+    """
+    Run every query in the block on one connection and read transaction
+    
+    Used to batch several tool calls: the connection is taken from the pool
+    once, and all queries read the same snapshot with a page cache warmed by
+    the first one. Nested blocks reuse the outer connection.
+    
+    Yields:
+        sqlite3.Connection: The pinned database connection
+    """
+    if getattr(_local, "conn", None) is not None:
+        yield _local.conn
+        return
+    
+    with get_db_connection() as conn:
+        _local.conn = conn
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            _local.conn = None
+            conn.execute("COMMIT")
@@ -36,6 +36,14 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     )
 
 
+async def database_exception_handler(request: Request, exc: DatabaseError):
+    """Database error handler"""
+    return JSONResponse(
+        status_code=500,
+        content={"detail": str(exc)}
+    )
+
+
 async def general_exception_handler(request: Request, exc: Exception):
     """Global general exception handler"""
     return JSONResponse(
@@ -0,0 +1,81 @@
+"""
+Logging configuration for the KCET College Predictor API
+"""
+import atexit
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.config import settings
+
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Identical records within this many seconds are collapsed into one
+DUPLICATE_WINDOW_S = 5.0
+
+_listener: Optional[QueueListener] = None
+
+
+class DuplicateFilter(logging.Filter):
+    """
+    Drop records identical to the previous one within a short window
+    
+    Repeated warnings (e.g. the same tool failing on every turn) are logged
+    once per window, with the number suppressed noted on the next record let
+    through.
+    """
+    
+    def __init__(self, window: float = DUPLICATE_WINDOW_S):
+        super().__init__()
+        self.window = window
+        self._last_key = None
+        self._last_time = 0.0
+        self._suppressed = 0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, record.msg, record.args)
+        now = time.monotonic()
+        if key == self._last_key and now - self._last_time < self.window:
+            self._suppressed += 1
+            return False
+        
+        if self._suppressed:
+            record.msg = f"{record.msg} (previous message repeated {self._suppressed} more times)"
+            self._suppressed = 0
+        self._last_key = key
+        self._last_time = now
+        return True
+
+
+def configure_logging():
+    """
+    Configure the "app" logger hierarchy (idempotent)
+    
+    With LOG_QUEUE enabled, records are put on an in-memory queue and written
+    to stderr by a QueueListener thread, so request handlers never wait on I/O.
+    """
+    global _listener
+    
+    logger = logging.getLogger("app")
+    logger.setLevel(settings.LOG_LEVEL)
+    if logger.handlers:
+        return
+    
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    stream_handler.addFilter(DuplicateFilter())
+    
+    if settings.LOG_QUEUE:
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        logger.addHandler(QueueHandler(log_queue))
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+    else:
+        logger.addHandler(stream_handler)
+    
+    logger.propagate = False
@@ -0,0 +1,84 @@
+"""
+Cached JSON responses for read-only endpoints
+
+The KCET dataset doesn't change while the process runs, so the serialized
+body of a read-only endpoint depends only on its arguments. Cached bodies are
+returned as-is, skipping the service call, response-model validation and
+JSON encoding.
+"""
+import functools
+import inspect
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.database import run_db
+
+
+# Serialized responses kept per endpoint
+RESPONSE_CACHE_SIZE = 2048
+
+# Every cached endpoint, so all of them can be cleared together
+_CACHED_ENDPOINTS: List[Callable] = []
+
+
+def _freeze(value: Any) -> Any:
+    """Make a query argument hashable (e.g. repeated query parameters)"""
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def cached_json(response_model: Any, maxsize: int = RESPONSE_CACHE_SIZE) -> Callable:
+    """
+    Cache an endpoint's serialized JSON body by its arguments
+
+    The first call validates the result against response_model exactly like
+    FastAPI would; later calls with the same arguments return the stored
+    bytes. Errors are raised as usual and never cached. Keep response_model
+    on the route decorator as well so the OpenAPI schema is unchanged.
+    
+    Plain (def) endpoints run on the database executor on a miss (see
+    run_db), so blocking service calls stay off the event loop; hits are
+    answered on the loop without a thread hop.
+
+    Args:
+        response_model: Type the endpoint's result is serialized as
+        maxsize: Maximum number of cached bodies for this endpoint
+    """
+    adapter = TypeAdapter(response_model)
+
+    def decorator(endpoint: Callable[..., Any]) -> Callable[..., Awaitable[Response]]:
+        cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        is_async = inspect.iscoroutinefunction(endpoint)
+
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs) -> Response:
+            key = tuple(sorted((name, _freeze(value)) for name, value in kwargs.items()))
+            body = cache.get(key)
+            if body is None:
+                if is_async:
+                    result = await endpoint(**kwargs)
+                else:
+                    result = await run_db(endpoint, **kwargs)
+                body = adapter.dump_json(adapter.validate_python(result))
+                cache[key] = body
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            else:
+                cache.move_to_end(key)
+            return Response(content=body, media_type="application/json")
+
+        wrapper.cache_clear = cache.clear  # type: ignore[attr-defined]
+        _CACHED_ENDPOINTS.append(wrapper)
+        return wrapper
+
+    return decorator
+
+
+def clear_response_caches():
+    """Drop every cached response (e.g. after refreshing the dataset)"""
+    for endpoint in _CACHED_ENDPOINTS:
+        endpoint.cache_clear()
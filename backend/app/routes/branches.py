@@ -1,10 +1,10 @@
 """
 Branch routes for the KCET College Predictor API
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from typing import List
 
-from app.services import CollegeService
+from app.services import all_branches_json
 
 router = APIRouter(
     prefix="/branches",
@@ -14,5 +14,5 @@ router = APIRouter(
 
 @router.get("/list", response_model=List[str])
 async def get_branches():
-    """Get list of all available branches"""
-    return CollegeService.get_all_branches()
+    """Get list of all available branches (a body serialized once at startup)"""
+    return Response(content=all_branches_json(), media_type="application/json")
@@ -3,17 +3,24 @@ Chat routes for AI counselor
 
 Includes WebSocket endpoint for real-time chat and REST endpoints for session management
 """
+import asyncio
 import json
+import logging
 import os
-from typing import List
+import weakref
+from typing import List, Optional
+
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
-from app.ai.session_manager import session_manager, Message
+from app.ai.session_manager import session_manager, ChatSession, Message
 from app.ai.agent import agent
 from app.ai.prompts import WELCOME_MESSAGE, ERROR_MESSAGE
 
 
+logger = logging.getLogger("app.routes.chat")
+
 router = APIRouter(
     prefix="/chat",
     tags=["chat"]
@@ -22,30 +29,78 @@ router = APIRouter(
 
 # WebSocket connection manager
 class ConnectionManager:
-    """Manages WebSocket connections"""
+    """
+    Manages WebSocket connections
+    
+    Connections are held weakly, so a socket whose endpoint has returned drops
+    out even if disconnect() was never reached.
+    """
     
     def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
+        self.active_connections: "weakref.WeakValueDictionary[str, WebSocket]" = weakref.WeakValueDictionary()
     
     async def connect(self, websocket: WebSocket, session_id: str):
         """Accept and store WebSocket connection"""
         await websocket.accept()
         self.active_connections[session_id] = websocket
     
-    def disconnect(self, session_id: str):
-        """Remove WebSocket connection"""
-        if session_id in self.active_connections:
+    def disconnect(self, session_id: str, websocket: Optional[WebSocket] = None):
+        """
+        Remove WebSocket connection
+        
+        Args:
+            session_id: Session the connection belongs to
+            websocket: Only remove the entry if it is this connection, so a
+                closing socket doesn't drop a newer one for the same session
+        """
+        current = self.active_connections.get(session_id)
+        if current is not None and (websocket is None or current is websocket):
             del self.active_connections[session_id]
     
-    async def send_message(self, session_id: str, message: dict):
-        """Send message to specific session"""
-        if session_id in self.active_connections:
-            await self.active_connections[session_id].send_json(message)
+    async def send_message(self, session_id: str, payload: str):
+        """
+        Send a pre-serialized message to a specific session
+        
+        Args:
+            session_id: Target session
+            payload: JSON text, encoded once by the caller (e.g. with orjson)
+        """
+        websocket = self.active_connections.get(session_id)
+        if websocket is not None:
+            await websocket.send_text(payload)
 
 
 manager = ConnectionManager()
 
 
+# Streamed text is coalesced into one response_chunk frame until it reaches
+# this many characters or this long has passed since the previous frame
+CHUNK_FLUSH_CHARS = 256
+CHUNK_FLUSH_INTERVAL_S = 0.05
+
+
+async def send_chunk(websocket: WebSocket, content: str):
+    """Send one response_chunk frame (as a text frame, encoded with orjson)"""
+    await websocket.send_text(orjson.dumps({
+        "type": "response_chunk",
+        "content": content,
+        "is_final": False
+    }).decode())
+
+
+async def load_session(session_id: str) -> Optional[ChatSession]:
+    """
+    Get a session without blocking the event loop
+    
+    Sessions in memory are returned directly; loading one from the database
+    (which may wait for its queued write) runs in a worker thread.
+    """
+    session = session_manager.get_cached_session(session_id)
+    if session is None:
+        session = await asyncio.to_thread(session_manager.get_session, session_id)
+    return session
+
+
 @router.websocket("/ws/{session_id}")
 async def websocket_chat(websocket: WebSocket, session_id: str):
     """
@@ -65,17 +120,16 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
     await manager.connect(websocket, session_id)
     
     # Get or create session
-    session = session_manager.get_session(session_id)
+    session = await load_session(session_id)
     if not session:
         session = session_manager.create_session()
         # Update session_id to match requested one
         session.session_id = session_id
-        session_manager.update_session(session)
         
         # Send welcome message
         welcome_msg = Message(role="assistant", content=WELCOME_MESSAGE)
         session.add_message(welcome_msg)
-        session_manager.update_session(session)
+        session_manager.mark_dirty(session)
         
         await websocket.send_json({
             "type": "welcome",
@@ -95,9 +149,9 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
                     continue
                 
                 # Add user message to session
+                # (the session is written once, when the turn ends)
                 user_msg = Message(role="user", content=user_message)
                 session.add_message(user_msg)
-                session_manager.update_session(session)
                 
                 # Define callback functions for streaming
                 async def emit_thinking(step: str):
@@ -106,10 +160,10 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
                         await websocket.send_json({
                             "type": "thinking",
                             "step": step,
-                            "timestamp": user_msg.timestamp.isoformat()
+                            "timestamp": user_msg.timestamp_iso
                         })
                     except Exception as e:
-                        print(f"⚠️ Failed to send thinking step: {e}")
+                        logger.warning("Failed to send thinking step: %s", e, extra={"session_id": session_id})
                 
                 async def emit_tool_call(tool_name: str, parameters: dict, status: str):
                     """Emit tool call status"""
@@ -121,11 +175,16 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
                             "status": status
                         })
                     except Exception as e:
-                        print(f"⚠️ Failed to send tool call status: {e}")
+                        logger.warning("Failed to send tool call status: %s", e, extra={"session_id": session_id})
                 
                 try:
                     # Process message with AI agent
                     response_text = ""
+                    loop = asyncio.get_running_loop()
+                    pending: List[str] = []
+                    pending_length = 0
+                    last_flush = float("-inf")  # The first chunk goes out immediately
+                    
                     async for chunk in agent.process_message(
                         user_message,
                         session,
@@ -133,20 +192,38 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
                         emit_tool_call=emit_tool_call
                     ):
                         response_text += chunk
+                        pending.append(chunk)
+                        pending_length += len(chunk)
+                        now = loop.time()
+                        if pending_length < CHUNK_FLUSH_CHARS and now - last_flush < CHUNK_FLUSH_INTERVAL_S:
+                            continue
+                        
+                        content = "".join(pending)
+                        pending.clear()
+                        pending_length = 0
+                        last_flush = now
                         try:
-                            await websocket.send_json({
-                                "type": "response_chunk",
-                                "content": chunk,
-                                "is_final": False
-                            })
+                            await send_chunk(websocket, content)
                         except Exception as e:
-                            print(f"⚠️ Failed to send response chunk (client may have disconnected): {e}")
+                            logger.warning(
+                                "Failed to send response chunk (client may have disconnected): %s", e,
+                                extra={"session_id": session_id}
+                            )
                             # Continue processing even if client disconnected
                     
+                    # Flush whatever is still buffered before completing
+                    if pending:
+                        try:
+                            await send_chunk(websocket, "".join(pending))
+                        except Exception as e:
+                            logger.warning(
+                                "Failed to send response chunk (client may have disconnected): %s", e,
+                                extra={"session_id": session_id}
+                            )
+                    
                     # Add assistant response to session
                     assistant_msg = Message(role="assistant", content=response_text)
                     session.add_message(assistant_msg)
-                    session_manager.update_session(session)
                     
                     # Send completion message
                     try:
@@ -156,33 +233,32 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
                             "full_content": response_text
                         })
                     except Exception as e:
-                        print(f"⚠️ Failed to send completion message: {e}")
+                        logger.warning("Failed to send completion message: %s", e, extra={"session_id": session_id})
                     
                 except Exception as e:
-                    import traceback
-                    error_msg = f"Error processing message: {str(e)}"
-                    error_trace = traceback.format_exc()
-                    print(f"Error in websocket_chat: {error_msg}")
-                    print(f"Traceback: {error_trace}")
+                    logger.exception("Error processing message in websocket_chat", extra={"session_id": session_id})
                     await websocket.send_json({
                         "type": "error",
                         "message": ERROR_MESSAGE,
                         "details": str(e) if os.getenv("DEBUG") else None
                     })
+                finally:
+                    # One write per turn, whether it succeeded, failed or was cut short
+                    session_manager.mark_dirty(session)
             
             elif msg_type == "get_history":
                 # Send conversation history
                 messages = [msg.to_dict() for msg in session.messages]
-                await websocket.send_json({
+                await websocket.send_text(orjson.dumps({
                     "type": "history",
                     "messages": messages
-                })
+                }).decode())
     
     except WebSocketDisconnect:
-        manager.disconnect(session_id)
+        manager.disconnect(session_id, websocket)
     except Exception as e:
-        print(f"WebSocket error: {str(e)}")
-        manager.disconnect(session_id)
+        logger.exception("WebSocket error", extra={"session_id": session_id})
+        manager.disconnect(session_id, websocket)
 
 
 # REST endpoints for session management
@@ -195,11 +271,11 @@ async def create_session():
     # Add welcome message
     welcome_msg = Message(role="assistant", content=WELCOME_MESSAGE)
     session.add_message(welcome_msg)
-    session_manager.update_session(session)
+    session_manager.mark_dirty(session)
     
     return {
         "session_id": session.session_id,
-        "created_at": session.created_at.isoformat(),
+        "created_at": session.created_at_iso,
         "message": "Session created successfully"
     }
 
@@ -207,25 +283,27 @@ async def create_session():
 @router.get("/sessions/{session_id}")
 async def get_session(session_id: str):
     """Get full session with conversation history"""
-    session = session_manager.get_session(session_id)
+    session = await load_session(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return {
+    # Returned as a response directly: the message dicts are built (and cached)
+    # by Message.to_dict, so FastAPI's jsonable_encoder pass is skipped
+    return ORJSONResponse({
         "session_id": session.session_id,
-        "created_at": session.created_at.isoformat(),
-        "updated_at": session.updated_at.isoformat(),
-        "message_count": len(session.messages),
+        "created_at": session.created_at_iso,
+        "updated_at": session.updated_at_iso,
+        "message_count": session.message_count,
         "messages": [msg.to_dict() for msg in session.messages],
         "context": session.context,
         "metadata": session.metadata
-    }
+    })
 
 
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session"""
-    success = session_manager.delete_session(session_id)
+    success = await asyncio.to_thread(session_manager.delete_session, session_id)
     if not success:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -235,21 +313,22 @@ async def delete_session(session_id: str):
 @router.get("/sessions/{session_id}/messages")
 async def get_messages(session_id: str, limit: int = None):
     """Get messages from a session"""
-    messages = session_manager.get_messages(session_id, limit)
-    if messages is None:
+    session = await load_session(session_id)
+    if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return {
+    messages = session.get_recent_messages(limit) if limit else list(session.messages)
+    return ORJSONResponse({
         "session_id": session_id,
         "message_count": len(messages),
         "messages": [msg.to_dict() for msg in messages]
-    }
+    })
 
 
 @router.get("/sessions")
 async def list_sessions():
     """List all session IDs"""
-    session_ids = session_manager.list_sessions()
+    session_ids = await asyncio.to_thread(session_manager.list_sessions)
     return {
         "count": len(session_ids),
         "session_ids": session_ids
@@ -1,8 +1,8 @@
 """
 College routes for the KCET College Predictor API
 """
-from fastapi import APIRouter, Query, Path
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Query, Path
+from typing import Literal, Optional, List
 
 from app.services import CollegeService
 from app.schemas import (
@@ -11,6 +11,7 @@ from app.schemas import (
     CollegeBranches
 )
 from app.config import settings
+from app.response_cache import cached_json
 
 router = APIRouter(
     prefix="/colleges",
@@ -19,7 +20,8 @@ router = APIRouter(
 
 
 @router.get("/by-rank/{rank}", response_model=CollegeList)
-async def get_colleges_by_rank(
+@cached_json(CollegeList)
+def get_colleges_by_rank(
     rank: int = Path(..., description="Student's KCET rank", gt=0),
     round: int = Query(
         settings.DEFAULT_ROUND, 
@@ -33,9 +35,8 @@ async def get_colleges_by_rank(
         le=500,
         description="Maximum number of colleges to return (default: 10)"
     ),
-    sort_order: str = Query(
+    sort_order: Literal["asc", "desc"] = Query(
         "asc",
-        regex="^(asc|desc)$",
         description="Sort order: 'asc' for best colleges first, 'desc' for worst first"
     )
 ):
@@ -46,11 +47,15 @@ async def get_colleges_by_rank(
     By default, returns top 10 colleges with cutoff >= your rank.
     """
     colleges = CollegeService.get_colleges_by_rank(rank, round, limit, sort_order)
-    return {"colleges": colleges, "total_count": len(colleges)}
+    total_count = len(colleges)
+    if limit is not None and total_count == limit:
+        total_count = CollegeService.count_colleges_by_rank(rank, round)
+    return {"colleges": colleges, "returned_count": len(colleges), "total_count": total_count}
 
 
 @router.get("/by-branch/{branch}", response_model=CollegeList)
-async def get_colleges_by_branch(
+@cached_json(CollegeList)
+def get_colleges_by_branch(
     branch: str = Path(..., description="Branch name"),
     round: int = Query(
         settings.DEFAULT_ROUND, 
@@ -64,9 +69,8 @@ async def get_colleges_by_branch(
         le=500,
         description="Maximum number of colleges to return (default: all)"
     ),
-    sort_order: str = Query(
+    sort_order: Literal["asc", "desc"] = Query(
         "asc",
-        regex="^(asc|desc)$",
         description="Sort order: 'asc' for best colleges first, 'desc' for worst first"
     )
 ):
@@ -76,11 +80,15 @@ async def get_colleges_by_branch(
     Returns colleges sorted by cutoff rank (lower rank = better college).
     """
     colleges = CollegeService.get_colleges_by_branch(branch, round, limit, sort_order)
-    return {"colleges": colleges, "total_count": len(colleges)}
+    total_count = len(colleges)
+    if limit is not None and total_count == limit:
+        total_count = CollegeService.count_colleges_by_branch(branch, round)
+    return {"colleges": colleges, "returned_count": len(colleges), "total_count": total_count}
 
 
 @router.get("/cutoff/{college_code}/{branch}", response_model=CutoffTrend)
-async def get_college_cutoff(
+@cached_json(CutoffTrend)
+def get_college_cutoff(
     college_code: str = Path(..., description="College code"),
     branch: str = Path(..., description="Branch name")
 ):
@@ -89,7 +97,8 @@ async def get_college_cutoff(
 
 
 @router.get("/search", response_model=CollegeList)
-async def search_colleges(
+@cached_json(CollegeList)
+def search_colleges(
     min_rank: Optional[int] = Query(None, description="Minimum rank", gt=0),
     max_rank: Optional[int] = Query(None, description="Maximum rank", gt=0),
     branches: Optional[List[str]] = Query(None, description="Branch names (multiple allowed)"),
@@ -105,10 +114,17 @@ async def search_colleges(
         le=500,
         description="Maximum number of colleges to return (default: all)"
     ),
-    sort_order: str = Query(
+    sort_order: Literal["asc", "desc"] = Query(
         "asc",
-        regex="^(asc|desc)$",
         description="Sort order: 'asc' for best colleges first, 'desc' for worst first"
+    ),
+    after_college_code: Optional[str] = Query(
+        None,
+        description="College code of the last row of the previous page (use with after_branch)"
+    ),
+    after_branch: Optional[str] = Query(
+        None,
+        description="Branch name of the last row of the previous page (use with after_college_code)"
     )
 ):
     """
@@ -116,13 +132,26 @@ async def search_colleges(
     
     Returns colleges sorted by cutoff rank (lower rank = better college).
     You can filter by multiple branches by passing multiple 'branches' query parameters.
+    To page through large results, pass a limit and then the college_code and
+    branch_name of the last row received as after_college_code/after_branch.
     """
-    colleges = CollegeService.search_colleges(min_rank, max_rank, branches, round, limit, sort_order)
-    return {"colleges": colleges, "total_count": len(colleges)}
+    if (after_college_code is None) != (after_branch is None):
+        raise HTTPException(
+            status_code=400,
+            detail="after_college_code and after_branch must be given together"
+        )
+    after = None if after_college_code is None else (after_college_code, after_branch)
+    
+    colleges = CollegeService.search_colleges(min_rank, max_rank, branches, round, limit, sort_order, after)
+    total_count = len(colleges)
+    if after is not None or (limit is not None and total_count == limit):
+        total_count = CollegeService.count_search_results(min_rank, max_rank, branches, round)
+    return {"colleges": colleges, "returned_count": len(colleges), "total_count": total_count}
 
 
 @router.get("/{college_code}/branches", response_model=CollegeBranches)
-async def get_college_branches(
+@cached_json(CollegeBranches)
+def get_college_branches(
     college_code: str = Path(..., description="College code")
 ):
     """Get all branches and their cutoff ranks for a specific college"""
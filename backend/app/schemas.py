@@ -10,7 +10,8 @@ class College(BaseModel):
 
 class CollegeList(BaseModel):
     colleges: List[College]
-    total_count: Optional[int] = None
+    returned_count: Optional[int] = None
+    total_count: Optional[int] = None  # Matches before the limit was applied
 
 class CutoffTrend(BaseModel):
     college_name: str
@@ -1,16 +1,431 @@
 """
 Business logic services for college and branch operations
 """
-from typing import List, Optional, Dict
+import copy
+import functools
+from collections import Counter, namedtuple
+from difflib import SequenceMatcher
+from types import MappingProxyType
+from typing import FrozenSet, List, Optional, Dict, Tuple
 from builtins import round as builtin_round
 
+import orjson
+
+from app.config import settings
+from app.column_store import cutoff_columns, fold_nocase
+from app.response_cache import clear_response_caches
 from app.database import execute_query
 from app.exceptions import NoDataFoundError, CollegeNotFoundError
 
 
+# Cutoff column for each counselling round. Queries are specialized to the
+# concrete column (a whitelisted identifier, never user input) instead of
+# selecting it with a per-row CASE on the round.
+RANK_COL = {1: "GM_rank_r1", 2: "GM_rank_r2", 3: "GM_rank_r3"}
+
+SORT_ORDERS = ("ASC", "DESC")
+
+
+def rank_column(round: int) -> str:
+    """
+    Cutoff column for a counselling round
+    
+    Raises:
+        ValueError: If round is not a known counselling round
+    """
+    try:
+        return RANK_COL[round]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid round: {round}. Must be one of {sorted(RANK_COL)}")
+
+
+def sort_direction(sort_order: str) -> str:
+    """
+    SQL sort direction for a sort order ('asc' or 'desc', case-insensitive)
+    
+    Raises:
+        ValueError: If sort_order is neither 'asc' nor 'desc'
+    """
+    order = sort_order.upper() if isinstance(sort_order, str) else None
+    if order not in SORT_ORDERS:
+        raise ValueError(f"Invalid sort order: {sort_order}. Must be 'asc' or 'desc'")
+    return order
+
+
+def search_conditions(
+    column: str,
+    min_rank: Optional[int],
+    max_rank: Optional[int],
+    branches: Optional[List[str]]
+) -> Tuple[str, List]:
+    """
+    WHERE conditions for search_colleges' filters, to append after "WHERE 1=1"
+    
+    Args:
+        column: Cutoff column of the round (from rank_column)
+        min_rank: Minimum rank filter (optional)
+        max_rank: Maximum rank filter (optional)
+        branches: Branch names to filter (optional)
+        
+    Returns:
+        Tuple of (SQL text, parameters)
+    """
+    conditions = []
+    params: List = []
+    
+    if min_rank is not None:
+        conditions.append(f"AND {column} >= ?")
+        params.append(min_rank)
+    
+    if max_rank is not None:
+        conditions.append(f"AND {column} <= ?")
+        params.append(max_rank)
+    
+    if branches and len(branches) > 0:
+        # Create placeholders for IN clause
+        placeholders = ",".join(["?" for _ in branches])
+        conditions.append(f"AND branch_name COLLATE NOCASE IN ({placeholders})")
+        params.extend(branches)
+    
+    return " " + " ".join(conditions), params
+
+
+# Fully formed queries per (round, sort order), built once at import. Ties are
+# broken by rowid so results don't depend on which index the planner picks.
+COLLEGES_BY_RANK_SQL = {
+    (round, order): f"""
+        SELECT college_code, college_name, branch_name, {column} as cutoff_rank
+        FROM kcet_2024
+        WHERE {column} >= ?
+        ORDER BY cutoff_rank {order}, rowid
+        """
+    for round, column in RANK_COL.items() for order in SORT_ORDERS
+}
+
+COLLEGES_BY_BRANCH_SQL = {
+    (round, order): f"""
+        SELECT college_code, college_name, branch_name, {column} as cutoff_rank
+        FROM kcet_2024
+        WHERE branch_name = ? COLLATE NOCASE
+        ORDER BY cutoff_rank {order}, rowid
+        """
+    for round, column in RANK_COL.items() for order in SORT_ORDERS
+}
+
+COUNT_BY_RANK_SQL = {
+    round: f"SELECT COUNT(*) FROM kcet_2024 WHERE {column} >= ?"
+    for round, column in RANK_COL.items()
+}
+
+# search_colleges' SELECT per round; its filters are appended after "WHERE 1=1"
+SEARCH_SQL = {
+    round: f"""
+        SELECT college_code, college_name, branch_name, {column} as cutoff_rank
+        FROM kcet_2024
+        WHERE 1=1
+        """
+    for round, column in RANK_COL.items()
+}
+
+# Colleges listed in a single branch's popularity stats
+BRANCH_TOP_COLLEGES = 10
+
+# A branch's aggregates over all its colleges, repeated on each of its top rows
+BRANCH_POPULARITY_SQL = {
+    round: f"""
+            WITH stats AS (
+                SELECT COUNT(*) as total_colleges,
+                       MIN({column}) as best_cutoff,
+                       AVG({column}) as avg_cutoff,
+                       MAX({column}) as worst_cutoff
+                FROM kcet_2024
+                WHERE branch_name = ? COLLATE NOCASE
+                AND {column} IS NOT NULL
+            )
+            SELECT k.college_code, k.college_name, k.branch_name, k.{column} as cutoff_rank,
+                   stats.total_colleges, stats.best_cutoff, stats.avg_cutoff, stats.worst_cutoff
+            FROM kcet_2024 k, stats
+            WHERE k.branch_name = ? COLLATE NOCASE
+            AND k.{column} IS NOT NULL
+            ORDER BY cutoff_rank ASC, k.rowid
+            LIMIT ?
+            """
+    for round, column in RANK_COL.items()
+}
+
+BRANCH_SUMMARY_SQL = {
+    round: f"""
+            SELECT branch_name, COUNT(*) as college_count,
+                   MIN({column}) as best_cutoff,
+                   AVG({column}) as avg_cutoff
+            FROM kcet_2024
+            WHERE {column} IS NOT NULL
+            GROUP BY branch_name
+            ORDER BY best_cutoff ASC, branch_name
+            """
+    for round, column in RANK_COL.items()
+}
+
+# Upper bounds of cutoff - rank for the best/good/moderate prospect categories;
+# anything further above the rank is a reach
+PROSPECT_MARGINS = (2000, 5000, 10000)
+# Colleges listed per prospect category (best, good, moderate, reach)
+PROSPECT_LIST_SIZES = (10, 10, 10, 5)
+
+# Per round: the listed colleges of each prospect band plus every band's size,
+# bucketed and trimmed by SQLite so only the listed rows are returned
+PROSPECT_BANDS_SQL = {
+    round: f"""
+        WITH banded AS (
+            SELECT college_code, college_name, branch_name, {column} as cutoff_rank, rowid as row_id,
+                   CASE
+                       WHEN {column} - ? <= {PROSPECT_MARGINS[0]} THEN 0
+                       WHEN {column} - ? <= {PROSPECT_MARGINS[1]} THEN 1
+                       WHEN {column} - ? <= {PROSPECT_MARGINS[2]} THEN 2
+                       ELSE 3
+                   END as band
+            FROM kcet_2024
+            WHERE {column} >= ?
+        ), ranked AS (
+            SELECT *,
+                   ROW_NUMBER() OVER (PARTITION BY band ORDER BY cutoff_rank, row_id) as position,
+                   COUNT(*) OVER (PARTITION BY band) as band_size
+            FROM banded
+        )
+        SELECT band, band_size, college_code, college_name, branch_name, cutoff_rank
+        FROM ranked
+        WHERE position <= CASE band
+            WHEN 0 THEN {PROSPECT_LIST_SIZES[0]}
+            WHEN 1 THEN {PROSPECT_LIST_SIZES[1]}
+            WHEN 2 THEN {PROSPECT_LIST_SIZES[2]}
+            ELSE {PROSPECT_LIST_SIZES[3]}
+        END
+        ORDER BY band, position
+        """
+    for round, column in RANK_COL.items()
+}
+
+
+@functools.lru_cache(maxsize=1)
+def load_all_branches() -> Tuple[str, ...]:
+    """
+    Sorted branch names of the static dataset, read once per process
+    
+    Call load_all_branches.cache_clear() after refreshing the dataset.
+    """
+    query = "SELECT DISTINCT branch_name FROM kcet_2024 ORDER BY branch_name"
+    return tuple(row["branch_name"] for row in execute_query(query, as_dict=False))
+
+
+@functools.lru_cache(maxsize=None)
+def load_branch_summary(round: int) -> Tuple[Dict, ...]:
+    """
+    Per-branch statistics of a round, aggregated once per process
+    
+    Call load_branch_summary.cache_clear() after refreshing the dataset.
+    
+    Args:
+        round: Counselling round number (must be valid, see rank_column)
+        
+    Returns:
+        Summary dicts ordered by best cutoff, as get_branch_popularity lists them
+    """
+    summary = []
+    for row in execute_query(BRANCH_SUMMARY_SQL[round], as_dict=False):
+        summary.append({
+            "branch_name": row["branch_name"],
+            "college_count": row["college_count"],
+            "best_cutoff": builtin_round(row["best_cutoff"]) if row["best_cutoff"] else 0,
+            "avg_cutoff": builtin_round(row["avg_cutoff"]) if row["avg_cutoff"] else 0,
+            "competitiveness": "High" if row["best_cutoff"] and row["best_cutoff"] < 5000 else "Medium" if row["best_cutoff"] and row["best_cutoff"] < 20000 else "Low"
+        })
+    return tuple(summary)
+
+
+@functools.lru_cache(maxsize=1)
+def load_all_colleges() -> Tuple[Tuple[str, str], ...]:
+    """
+    (college_code, college_name) pairs of the static dataset, read once per process
+    
+    Call load_all_colleges.cache_clear() after refreshing the dataset.
+    """
+    query = """
+    SELECT DISTINCT college_code, college_name
+    FROM kcet_2024
+    ORDER BY college_code
+    """
+    return tuple((row[0], row[1]) for row in execute_query(query, as_dict=False))
+
+
+# Words left out of a college's initials (so "RV" matches "R V College of Engineering")
+INITIALS_SKIP_WORDS = frozenset((
+    "of", "the", "and", "institute", "college", "university", "engineering",
+    "bangalore", "mysore", "mangalore", "belgaum", "hubli", "dharwad"
+))
+
+# Common branch abbreviations and what they expand to
+BRANCH_ABBREVIATIONS = MappingProxyType({
+    "cs": ("computer science", "computers"),
+    "cse": ("computer science engineering",),
+    "is": ("information science",),
+    "ise": ("information science engineering",),
+    "ece": ("electronics and communication", "electronics"),
+    "ec": ("electronics", "electronics and communication"),
+    "eee": ("electrical and electronics", "electrical"),
+    "ee": ("electrical",),
+    "me": ("mechanical",),
+    "mech": ("mechanical",),
+    "ce": ("civil",),
+    "civil": ("civil",),
+    "aiml": ("artificial intelligence", "machine learning", "ai", "ml"),
+    "ai": ("artificial intelligence",),
+    "ml": ("machine learning",),
+    "ds": ("data science",),
+    "biotech": ("bio technology", "biotechnology"),
+    "chem": ("chemical",),
+    "auto": ("automobile", "automotive"),
+    "aero": ("aeronautical", "aerospace")
+})
+
+
+@functools.lru_cache(maxsize=1024)
+def expand_branch_query(query_lower: str) -> Tuple[Tuple[str, FrozenSet[str], Counter], ...]:
+    """
+    A lowercased branch query and its abbreviation expansions, with word sets
+    
+    An abbreviation applies when it occurs in the query or the query occurs in
+    it (so "c" expands like "cs"). Results are cached, so repeated queries
+    skip the scan over BRANCH_ABBREVIATIONS.
+    
+    Returns:
+        (query, set of its words, its character counts) tuples, the original
+        query first
+    """
+    expanded = [query_lower]
+    for abbr, expansions in BRANCH_ABBREVIATIONS.items():
+        if abbr in query_lower or query_lower in abbr:
+            expanded.extend(expansions)
+    return tuple((q, frozenset(q.split()), Counter(q)) for q in expanded)
+
+class FuzzyName:
+    """
+    A name prepared once for repeated SequenceMatcher scoring against queries
+    
+    SequenceMatcher indexes its second sequence (the name) on construction;
+    here that index and the name's character counts are built once, and each
+    query works on a cheap copy of the prepared matcher.
+    """
+    
+    __slots__ = ("text", "char_counts", "_template")
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.char_counts = Counter(text)
+        self._template = SequenceMatcher(None, "", text)
+    
+    def similarity_above(self, query: str, query_counts: Dict[str, int], floor: float) -> float:
+        """
+        SequenceMatcher(None, query, text).ratio() if it can exceed floor, else 0.0
+        
+        Scores at or below floor are discarded by the callers, so the full
+        (quadratic) ratio is only computed when the cheap upper bounds (the
+        length bound, then the shared character count that quick_ratio uses)
+        leave room to beat floor.
+        
+        Args:
+            query: Lowercased query
+            query_counts: Counter(query)
+            floor: Score the result has to exceed to be of use
+        """
+        total = len(query) + len(self.text)
+        if not total or 2.0 * min(len(query), len(self.text)) / total <= floor:
+            return 0.0
+        counts = self.char_counts
+        shared = sum(min(count, counts[char]) for char, count in query_counts.items())
+        if 2.0 * shared / total <= floor:
+            return 0.0
+        matcher = copy.copy(self._template)
+        matcher.set_seq1(query)
+        return matcher.ratio()
+
+
+def college_branches(rows: List) -> Dict:
+    """
+    get_college_branches' result from a college's rows
+    
+    Args:
+        rows: Non-empty rows with college_name, branch_name and GM_rank_r1..3
+        
+    Returns:
+        Dictionary containing college name and list of branches with cutoff ranks
+    """
+    # Missing cutoffs are reported as 0
+    branches = [
+        {
+            "branch_name": row["branch_name"],
+            "cutoff_ranks": {
+                "round1": row["GM_rank_r1"] or 0,
+                "round2": row["GM_rank_r2"] or 0,
+                "round3": row["GM_rank_r3"] or 0
+            }
+        }
+        for row in rows
+    ]
+    
+    return {
+        "college_name": rows[0]["college_name"],
+        "branches": branches
+    }
+
+
+# Fuzzy-search features derived from a name once instead of on every query
+CollegeSearchRow = namedtuple("CollegeSearchRow", "college_code college_name name_lower initials fuzzy")
+BranchSearchRow = namedtuple("BranchSearchRow", "branch_name name_lower word_set fuzzy")
+
+
+@functools.lru_cache(maxsize=1)
+def college_search_rows() -> Tuple[CollegeSearchRow, ...]:
+    """Every college with its lowercased name, initials and matcher (built once per process)"""
+    rows = []
+    for college_code, college_name in load_all_colleges():
+        name_lower = college_name.lower()
+        words = name_lower.replace(".", "").replace(",", "").split()
+        initials = "".join(w[0] for w in words if w not in INITIALS_SKIP_WORDS)
+        rows.append(CollegeSearchRow(college_code, college_name, name_lower, initials, FuzzyName(name_lower)))
+    return tuple(rows)
+
+
+@functools.lru_cache(maxsize=1)
+def branch_search_rows() -> Tuple[BranchSearchRow, ...]:
+    """Every branch with its lowercased name, word set and matcher (built once per process)"""
+    rows = []
+    for branch_name in load_all_branches():
+        name_lower = branch_name.lower()
+        rows.append(BranchSearchRow(branch_name, name_lower, frozenset(name_lower.split()), FuzzyName(name_lower)))
+    return tuple(rows)
+
+
+@functools.lru_cache(maxsize=1)
+def all_branches_json() -> bytes:
+    """The /branches/list response body, serialized once per process"""
+    return orjson.dumps(load_all_branches())
+
+
 class CollegeService:
     """Service class for college-related operations"""
     
+    @staticmethod
+    def cache_clear():
+        """Drop every per-process copy of the dataset (call after refreshing it)"""
+        load_all_branches.cache_clear()
+        load_all_colleges.cache_clear()
+        load_branch_summary.cache_clear()
+        college_search_rows.cache_clear()
+        branch_search_rows.cache_clear()
+        all_branches_json.cache_clear()
+        cutoff_columns.cache_clear()
+        clear_response_caches()
+    
     @staticmethod
     def get_colleges_by_rank(
         rank: int, 
@@ -34,28 +449,23 @@ class CollegeService:
             NoDataFoundError: If no colleges found for the given rank
         """
         # Determine sort direction (asc = lower rank numbers = better colleges)
-        order = "ASC" if sort_order.lower() == "asc" else "DESC"
+        order = sort_direction(sort_order)
         
-        query = f"""
-        SELECT college_code, college_name, branch_name, 
-               CASE 
-                   WHEN ? = 1 THEN GM_rank_r1
-                   WHEN ? = 2 THEN GM_rank_r2
-                   WHEN ? = 3 THEN GM_rank_r3
-               END as cutoff_rank
-        FROM kcet_2024
-        WHERE CASE 
-                WHEN ? = 1 THEN GM_rank_r1 >= ?
-                WHEN ? = 2 THEN GM_rank_r2 >= ?
-                WHEN ? = 3 THEN GM_rank_r3 >= ?
-              END
-        ORDER BY cutoff_rank {order}
-        """
+        if settings.COLUMN_STORE:
+            results = cutoff_columns().colleges_by_rank(rank, round, limit, order == "DESC")
+            if results is not None:
+                if not results:
+                    raise NoDataFoundError("No colleges found for given rank")
+                return results
         
+        rank_column(round)  # Rejects unknown rounds
+        query = COLLEGES_BY_RANK_SQL[round, order]
+        
+        params = (rank,)
         if limit is not None:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params += (limit,)
         
-        params = (round, round, round, round, rank, round, rank, round, rank)
         results = execute_query(query, params)
         if not results:
             raise NoDataFoundError("No colleges found for given rank")
@@ -84,24 +494,23 @@ class CollegeService:
             NoDataFoundError: If no colleges found for the given branch
         """
         # Determine sort direction (asc = lower rank numbers = better colleges)
-        order = "ASC" if sort_order.lower() == "asc" else "DESC"
+        order = sort_direction(sort_order)
         
-        query = f"""
-        SELECT college_code, college_name, branch_name,
-               CASE 
-                   WHEN ? = 1 THEN GM_rank_r1
-                   WHEN ? = 2 THEN GM_rank_r2
-                   WHEN ? = 3 THEN GM_rank_r3
-               END as cutoff_rank
-        FROM kcet_2024
-        WHERE LOWER(branch_name) = LOWER(?)
-        ORDER BY cutoff_rank {order}
-        """
+        if settings.COLUMN_STORE:
+            results = cutoff_columns().colleges_by_branch(branch, round, limit, order == "DESC")
+            if results is not None:
+                if not results:
+                    raise NoDataFoundError("No colleges found for given branch")
+                return results
         
+        rank_column(round)  # Rejects unknown rounds
+        query = COLLEGES_BY_BRANCH_SQL[round, order]
+        
+        params = (branch,)
         if limit is not None:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params += (limit,)
         
-        params = (round, round, round, branch)
         results = execute_query(query, params)
         if not results:
             raise NoDataFoundError("No colleges found for given branch")
@@ -122,12 +531,21 @@ class CollegeService:
         Raises:
             NoDataFoundError: If no data found for the given college and branch
         """
-        query = """
-        SELECT college_name, branch_name, GM_rank_r1, GM_rank_r2, GM_rank_r3
-        FROM kcet_2024
-        WHERE college_code = ? AND LOWER(branch_name) = LOWER(?)
-        """
-        results = execute_query(query, (college_code, branch))
+        results = None
+        if settings.COLUMN_STORE and isinstance(branch, str):
+            rows = cutoff_columns().college_rows(college_code)
+            if rows is not None:
+                folded = fold_nocase(branch)
+                results = [row for row in rows if fold_nocase(row["branch_name"]) == folded]
+        
+        if results is None:
+            query = """
+            SELECT college_name, branch_name, GM_rank_r1, GM_rank_r2, GM_rank_r3
+            FROM kcet_2024
+            WHERE college_code = ? AND branch_name = ? COLLATE NOCASE
+            ORDER BY rowid
+            """
+            results = execute_query(query, (college_code, branch), as_dict=False)
         if not results:
             raise NoDataFoundError("No data found for given college and branch")
         
@@ -149,11 +567,16 @@ class CollegeService:
         branches: Optional[List[str]] = None,
         round: int = 1,
         limit: Optional[int] = None,
-        sort_order: str = "asc"
+        sort_order: str = "asc",
+        after: Optional[Tuple[str, str]] = None
     ) -> List[Dict]:
         """
         Search colleges with multiple filters
         
+        Pass the (college_code, branch_name) of the last row received as after
+        to fetch the next page (keyset pagination); an unknown row yields an
+        empty page.
+        
         Args:
             min_rank: Minimum rank filter (optional)
             max_rank: Maximum rank filter (optional)
@@ -161,61 +584,110 @@ class CollegeService:
             round: Counselling round number (1, 2, or 3)
             limit: Maximum number of colleges to return (None for all)
             sort_order: Sort order - 'asc' for best colleges first, 'desc' for worst first
+            after: Cursor row to continue after (optional)
             
         Returns:
             List of dictionaries containing college information sorted by cutoff rank
         """
         # Determine sort direction
-        order = "ASC" if sort_order.lower() == "asc" else "DESC"
+        order = sort_direction(sort_order)
         
-        conditions = []
-        params = []
+        if settings.COLUMN_STORE:
+            results = cutoff_columns().search(min_rank, max_rank, branches, round, limit, order == "DESC", after)
+            if results is not None:
+                return results
         
-        query = f"""
-        SELECT college_code, college_name, branch_name,
-               CASE 
-                   WHEN ? = 1 THEN GM_rank_r1
-                   WHEN ? = 2 THEN GM_rank_r2
-                   WHEN ? = 3 THEN GM_rank_r3
-               END as cutoff_rank
-        FROM kcet_2024
-        WHERE 1=1
-        """
-        params.extend([round, round, round])
-
-        if min_rank is not None:
-            conditions.append(
-                f"""AND CASE 
-                    WHEN ? = 1 THEN GM_rank_r1 >= ?
-                    WHEN ? = 2 THEN GM_rank_r2 >= ?
-                    WHEN ? = 3 THEN GM_rank_r3 >= ?
-                END"""
-            )
-            params.extend([round, min_rank, round, min_rank, round, min_rank])
-
-        if max_rank is not None:
-            conditions.append(
-                f"""AND CASE 
-                    WHEN ? = 1 THEN GM_rank_r1 <= ?
-                    WHEN ? = 2 THEN GM_rank_r2 <= ?
-                    WHEN ? = 3 THEN GM_rank_r3 <= ?
-                END"""
+        column = rank_column(round)
+        conditions, params = search_conditions(column, min_rank, max_rank, branches)
+        query = SEARCH_SQL[round]
+        if after is not None:
+            # Same key as the ORDER BY below, with NULL cutoffs placed as SQLite sorts them
+            if order == "DESC":
+                sort_key = f"{column} IS NULL, -IFNULL({column}, 0), rowid"
+            else:
+                sort_key = f"{column} IS NOT NULL, IFNULL({column}, 0), rowid"
+            conditions += (
+                f" AND ({sort_key}) > "
+                f"(SELECT {sort_key} FROM kcet_2024 WHERE college_code = ? AND branch_name = ?)"
             )
-            params.extend([round, max_rank, round, max_rank, round, max_rank])
-
-        if branches and len(branches) > 0:
-            # Create placeholders for IN clause
-            placeholders = ",".join(["?" for _ in branches])
-            conditions.append(f"AND LOWER(branch_name) IN ({placeholders})")
-            params.extend([branch.lower() for branch in branches])
-
-        query += " " + " ".join(conditions) + f" ORDER BY cutoff_rank {order}"
+            params.extend(after)
+        query += conditions + f" ORDER BY cutoff_rank {order}, rowid"
         
         if limit is not None:
-            query += f" LIMIT {limit}"
+            query += " LIMIT ?"
+            params.append(limit)
         
         results = execute_query(query, tuple(params))
         return results  # Return empty list if no results found
+    
+    @staticmethod
+    def count_colleges_by_rank(rank: int, round: int = 1) -> int:
+        """
+        Count the colleges get_colleges_by_rank would return without a limit
+        
+        Args:
+            rank: Student's KCET rank
+            round: Counselling round number (1, 2, or 3)
+            
+        Returns:
+            Number of matching rows
+        """
+        if settings.COLUMN_STORE:
+            count = cutoff_columns().count_by_rank(rank, round)
+            if count is not None:
+                return count
+        
+        rank_column(round)  # Rejects unknown rounds
+        return execute_query(COUNT_BY_RANK_SQL[round], (rank,), as_dict=False)[0][0]
+    
+    @staticmethod
+    def count_colleges_by_branch(branch: str, round: int = 1) -> int:
+        """
+        Count the colleges get_colleges_by_branch would return without a limit
+        
+        Args:
+            branch: Branch name
+            round: Counselling round number (1, 2, or 3)
+            
+        Returns:
+            Number of matching rows
+        """
+        if settings.COLUMN_STORE:
+            count = cutoff_columns().count_by_branch(branch, round)
+            if count is not None:
+                return count
+        
+        rank_column(round)  # Rejects unknown rounds
+        query = "SELECT COUNT(*) FROM kcet_2024 WHERE branch_name = ? COLLATE NOCASE"
+        return execute_query(query, (branch,), as_dict=False)[0][0]
+    
+    @staticmethod
+    def count_search_results(
+        min_rank: Optional[int] = None,
+        max_rank: Optional[int] = None,
+        branches: Optional[List[str]] = None,
+        round: int = 1
+    ) -> int:
+        """
+        Count the colleges search_colleges would return without a limit
+        
+        Args:
+            min_rank: Minimum rank filter (optional)
+            max_rank: Maximum rank filter (optional)
+            branches: List of branch names to filter (optional)
+            round: Counselling round number (1, 2, or 3)
+            
+        Returns:
+            Number of matching rows
+        """
+        if settings.COLUMN_STORE:
+            count = cutoff_columns().count_search(min_rank, max_rank, branches, round)
+            if count is not None:
+                return count
+        
+        conditions, params = search_conditions(rank_column(round), min_rank, max_rank, branches)
+        query = "SELECT COUNT(*) FROM kcet_2024 WHERE 1=1" + conditions
+        return execute_query(query, tuple(params), as_dict=False)[0][0]
 
     @staticmethod
     def get_all_branches() -> List[str]:
@@ -225,9 +697,7 @@ class CollegeService:
         Returns:
             List of branch names
         """
-        query = "SELECT DISTINCT branch_name FROM kcet_2024 ORDER BY branch_name"
-        results = execute_query(query)
-        return [result["branch_name"] for result in results] if results else []
+        return list(load_all_branches())
 
     @staticmethod
     def get_college_branches(college_code: str) -> Dict:
@@ -243,31 +713,41 @@ class CollegeService:
         Raises:
             CollegeNotFoundError: If college not found
         """
-        query = """
-        SELECT college_name, branch_name, GM_rank_r1, GM_rank_r2, GM_rank_r3
-        FROM kcet_2024
-        WHERE college_code = ?
-        """
-        results = execute_query(query, (college_code,))
+        results = CollegeService.get_college_rows([college_code]).get(college_code)
         if not results:
             raise CollegeNotFoundError("College not found")
+        return college_branches(results)
+    
+    @staticmethod
+    def get_college_rows(college_codes: List[str]) -> Dict[str, List]:
+        """
+        Rows of several colleges in one lookup
         
-        college_name = results[0]["college_name"]
-        branches = []
-        for row in results:
-            branches.append({
-                "branch_name": row["branch_name"],
-                "cutoff_ranks": {
-                    "round1": row["GM_rank_r1"] if row["GM_rank_r1"] is not None else 0,
-                    "round2": row["GM_rank_r2"] if row["GM_rank_r2"] is not None else 0,
-                    "round3": row["GM_rank_r3"] if row["GM_rank_r3"] is not None else 0
-                }
-            })
+        Args:
+            college_codes: College codes
+            
+        Returns:
+            Dictionary mapping each known code to its rows (college_name,
+            branch_name, GM_rank_r1, GM_rank_r2, GM_rank_r3) in table order;
+            unknown codes are left out
+        """
+        if settings.COLUMN_STORE:
+            columns = cutoff_columns()
+            rows = {code: columns.college_rows(code) for code in college_codes}
+            if all(value is not None for value in rows.values()):
+                return {code: value for code, value in rows.items() if value}
         
-        return {
-            "college_name": college_name,
-            "branches": branches
-        }
+        placeholders = ",".join("?" for _ in college_codes)
+        query = f"""
+        SELECT college_code, college_name, branch_name, GM_rank_r1, GM_rank_r2, GM_rank_r3
+        FROM kcet_2024
+        WHERE college_code IN ({placeholders})
+        ORDER BY rowid
+        """
+        grouped: Dict[str, List] = {}
+        for row in execute_query(query, tuple(college_codes), as_dict=False):
+            grouped.setdefault(row["college_code"], []).append(row)
+        return grouped
     
     @staticmethod
     def search_college_by_name(query: str, limit: int = 10) -> List[Dict]:
@@ -281,23 +761,15 @@ class CollegeService:
         Returns:
             List of dictionaries with college_code, college_name, and match_score
         """
-        from difflib import SequenceMatcher
-        
-        # Get all unique colleges
-        sql_query = """
-        SELECT DISTINCT college_code, college_name
-        FROM kcet_2024
-        ORDER BY college_code
-        """
-        all_colleges = execute_query(sql_query, ())
-        
-        # Fuzzy match against query
+        # Fuzzy match against query (all unique colleges, cached for the process)
         query_lower = query.lower().strip()
+        query_clean = query_lower.replace(" ", "")
+        query_counts = Counter(query_lower)
+        check_initials = len(query_lower) <= 5
         matches = []
         
-        for college in all_colleges:
-            college_name = college["college_name"]
-            college_name_lower = college_name.lower()
+        for college in college_search_rows():
+            college_name_lower = college.name_lower
             
             # Calculate match score using different methods
             # 1. Exact substring match (highest priority)
@@ -305,25 +777,18 @@ class CollegeService:
                 score = 0.9 + (len(query_lower) / len(college_name_lower)) * 0.1
             # 2. Sequence matching
             else:
-                score = SequenceMatcher(None, query_lower, college_name_lower).ratio()
-            
-            # Also check for common abbreviations
-            clean_name = college_name_lower.replace(".", "").replace(",", "")
-            words = clean_name.split()
+                score = college.fuzzy.similarity_above(query_lower, query_counts, 0.3)
             
             # Check if query matches initials (e.g., "RV" for "R V College")
-            if len(query_lower) <= 5:
-                skip_words = ("of", "the", "and", "institute", "college", "university", "engineering", "bangalore", "mysore", "mangalore", "belgaum", "hubli", "dharwad")
-                initials = "".join([w[0] for w in words if w and w not in skip_words])
-                query_clean = query_lower.replace(" ", "")
+            if check_initials:
                 # Check if initials start with query or query matches initials exactly
-                if initials.lower().startswith(query_clean) or query_clean == initials.lower():
+                if college.initials.startswith(query_clean):
                     score = max(score, 0.95)
             
             if score > 0.3:  # Minimum threshold
                 matches.append({
-                    "college_code": college["college_code"],
-                    "college_name": college_name,
+                    "college_code": college.college_code,
+                    "college_name": college.college_name,
                     "match_score": round(score, 3)
                 })
         
@@ -343,76 +808,38 @@ class CollegeService:
         Returns:
             List of dictionaries with branch_name and match_score
         """
-        from difflib import SequenceMatcher
-        
-        # Common abbreviations mapping
-        abbreviations = {
-            "cs": ["computer science", "computers"],
-            "cse": ["computer science engineering"],
-            "is": ["information science"],
-            "ise": ["information science engineering"],
-            "ece": ["electronics and communication", "electronics"],
-            "ec": ["electronics", "electronics and communication"],
-            "eee": ["electrical and electronics", "electrical"],
-            "ee": ["electrical"],
-            "me": ["mechanical"],
-            "mech": ["mechanical"],
-            "ce": ["civil"],
-            "civil": ["civil"],
-            "aiml": ["artificial intelligence", "machine learning", "ai", "ml"],
-            "ai": ["artificial intelligence"],
-            "ml": ["machine learning"],
-            "ds": ["data science"],
-            "biotech": ["bio technology", "biotechnology"],
-            "chem": ["chemical"],
-            "auto": ["automobile", "automotive"],
-            "aero": ["aeronautical", "aerospace"]
-        }
-        
-        # Get all unique branches
-        sql_query = """
-        SELECT DISTINCT branch_name
-        FROM kcet_2024
-        ORDER BY branch_name
-        """
-        all_branches = execute_query(sql_query, ())
-        
         query_lower = query.lower().strip()
         matches = []
         
-        # Check if query is an abbreviation
-        expanded_queries = [query_lower]
-        for abbr, expansions in abbreviations.items():
-            if abbr in query_lower or query_lower in abbr:
-                expanded_queries.extend(expansions)
+        # Expand abbreviations in the query (cached per query)
+        expanded_queries = expand_branch_query(query_lower)
         
-        for branch in all_branches:
-            branch_name = branch["branch_name"]
-            branch_lower = branch_name.lower()
+        # All unique branches with their features (cached for the process)
+        for branch in branch_search_rows():
+            branch_lower = branch.name_lower
+            branch_words = branch.word_set
             
             max_score = 0
             
             # Check against all query variations
-            for q in expanded_queries:
+            for q, q_words, q_counts in expanded_queries:
                 # Exact substring match
                 if q in branch_lower:
                     score = 0.8 + (len(q) / len(branch_lower)) * 0.2
                     max_score = max(max_score, score)
                 
                 # Sequence matching
-                score = SequenceMatcher(None, q, branch_lower).ratio()
+                score = branch.fuzzy.similarity_above(q, q_counts, max(max_score, 0.4))
                 max_score = max(max_score, score)
                 
                 # Word-level matching
-                q_words = set(q.split())
-                branch_words = set(branch_lower.split())
                 if q_words and branch_words:
                     word_overlap = len(q_words & branch_words) / len(q_words)
                     max_score = max(max_score, word_overlap * 0.9)
             
             if max_score > 0.4:  # Minimum threshold
                 matches.append({
-                    "branch_name": branch_name,
+                    "branch_name": branch.branch_name,
                     "match_score": round(max_score, 3)
                 })
         
@@ -432,68 +859,42 @@ class CollegeService:
         Returns:
             Dictionary with statistics and categorized colleges
         """
-        # Get all accessible colleges for this rank
-        query = f"""
-        SELECT college_code, college_name, branch_name,
-               CASE 
-                   WHEN ? = 1 THEN GM_rank_r1
-                   WHEN ? = 2 THEN GM_rank_r2
-                   WHEN ? = 3 THEN GM_rank_r3
-               END as cutoff_rank
-        FROM kcet_2024
-        WHERE CASE 
-                WHEN ? = 1 THEN GM_rank_r1 >= ?
-                WHEN ? = 2 THEN GM_rank_r2 >= ?
-                WHEN ? = 3 THEN GM_rank_r3 >= ?
-              END
-        ORDER BY cutoff_rank ASC
-        """
-        results = execute_query(query, (round, round, round, round, rank, round, rank, round, rank))
+        bands = None
+        if settings.COLUMN_STORE:
+            # Bands come straight from the sorted cutoff column
+            bands = cutoff_columns().margin_bands(rank, round, PROSPECT_MARGINS)
+        if bands is not None:
+            listed = [band[:size] for band, size in zip(bands, PROSPECT_LIST_SIZES)]
+            counts = [len(band) for band in bands]
+        else:
+            listed, counts = CollegeService._query_prospect_bands(rank, round)
         
-        if not results:
+        total_options = sum(counts)
+        if not total_options:
             return {
                 "rank": rank,
                 "total_options": 0,
                 "message": "No colleges found for this rank. The rank may be too low for available options."
             }
         
-        total_options = len(results)
-        
         # Calculate percentile (rough estimate - assumes max rank of 200000)
         max_rank = 200000
         percentile = builtin_round(((max_rank - rank) / max_rank) * 100, 1)
         
-        # Categorize colleges
-        # Best: cutoff <= rank + 2000 (very safe)
-        # Good: cutoff <= rank + 5000 (safe)
-        # Moderate: cutoff <= rank + 10000 (decent chance)
-        # Reach: everything else
-        
-        best_colleges = []
-        good_colleges = []
-        moderate_colleges = []
-        reach_colleges = []
-        
-        for college in results:
-            cutoff = college["cutoff_rank"]
-            margin = cutoff - rank
-            
-            entry = {
-                "college_code": college["college_code"],
-                "college_name": college["college_name"],
-                "branch": college["branch_name"],
-                "cutoff_rank": cutoff,
-                "margin": margin
-            }
-            
-            if margin <= 2000:
-                best_colleges.append(entry)
-            elif margin <= 5000:
-                good_colleges.append(entry)
-            elif margin <= 10000:
-                moderate_colleges.append(entry)
-            else:
-                reach_colleges.append(entry)
+        # Entries are only built for the colleges that are listed
+        best_colleges, good_colleges, moderate_colleges, reach_colleges = (
+            [
+                {
+                    "college_code": college_code,
+                    "college_name": college_name,
+                    "branch": branch_name,
+                    "cutoff_rank": cutoff,
+                    "margin": cutoff - rank
+                }
+                for college_code, college_name, branch_name, cutoff in band
+            ]
+            for band in listed
+        )
         
         return {
             "rank": rank,
@@ -501,27 +902,53 @@ class CollegeService:
             "percentile": f"Top {percentile}%",
             "total_options": total_options,
             "summary": {
-                "best_options": len(best_colleges),
-                "good_options": len(good_colleges),
-                "moderate_options": len(moderate_colleges),
-                "reach_options": len(reach_colleges)
+                "best_options": counts[0],
+                "good_options": counts[1],
+                "moderate_options": counts[2],
+                "reach_options": counts[3]
             },
             "categories": {
-                "best": best_colleges[:10],  # Top 10 from each category
-                "good": good_colleges[:10],
-                "moderate": moderate_colleges[:10],
-                "reach": reach_colleges[:5]
+                "best": best_colleges,  # Top 10 from each category
+                "good": good_colleges,
+                "moderate": moderate_colleges,
+                "reach": reach_colleges
             }
         }
     
     @staticmethod
-    def compare_colleges(college_codes: List[str], round: int = 1) -> Dict:
+    def _query_prospect_bands(rank: int, round: int) -> Tuple[List[List[tuple]], List[int]]:
+        """
+        Listed colleges and sizes of the prospect bands for a rank, from SQL
+        
+        Bands are cutoff - rank within PROSPECT_MARGINS:
+        best (<= 2000, very safe), good (<= 5000, safe),
+        moderate (<= 10000, decent chance) and reach (everything else).
+        
+        Returns:
+            Tuple of (the first PROSPECT_LIST_SIZES
+            (college_code, college_name, branch_name, cutoff_rank) tuples of
+            each band, the number of colleges in each band)
+        """
+        rank_column(round)  # Rejects unknown rounds
+        
+        listed: List[List[tuple]] = [[] for _ in PROSPECT_LIST_SIZES]
+        counts = [0] * len(PROSPECT_LIST_SIZES)
+        for band, band_size, college_code, college_name, branch_name, cutoff in execute_query(
+            PROSPECT_BANDS_SQL[round], (rank, rank, rank, rank), as_dict=False
+        ):
+            listed[band].append((college_code, college_name, branch_name, cutoff))
+            counts[band] = band_size
+        return listed, counts
+    
+    @staticmethod
+    def compare_colleges(college_codes: List[str], round: int = 1, include_branches: bool = True) -> Dict:
         """
         Compare multiple colleges side-by-side
         
         Args:
             college_codes: List of college codes to compare (2-4 colleges)
             round: Counselling round number
+            include_branches: Include each college's full branch list, not just its stats
             
         Returns:
             Dictionary with comparison data structured for frontend rendering
@@ -532,31 +959,41 @@ class CollegeService:
         if len(college_codes) > 4:
             college_codes = college_codes[:4]  # Limit to 4 colleges
         
+        # Every college's rows in one lookup
+        college_rows = CollegeService.get_college_rows(college_codes)
+        column = RANK_COL.get(round)  # Unknown rounds have no cutoffs
         comparison_data = []
         
         for college_code in college_codes:
-            # Get college info
-            college_info = CollegeService.get_college_branches(college_code)
+            rows = college_rows.get(college_code)
+            if not rows:
+                raise CollegeNotFoundError("College not found")
             
-            # Extract key metrics
-            branches = college_info["branches"]
-            cutoffs = []
+            # Key metrics in one pass over the rows, without collecting the cutoffs
+            count = total = 0
+            best = worst = None
+            if column is not None:
+                for row in rows:
+                    cutoff = row[column]
+                    if cutoff is not None and cutoff > 0:
+                        count += 1
+                        total += cutoff
+                        if best is None or cutoff < best:
+                            best = cutoff
+                        if worst is None or cutoff > worst:
+                            worst = cutoff
             
-            for branch in branches:
-                cutoff_key = f"round{round}"
-                cutoff = branch["cutoff_ranks"].get(cutoff_key, 0)
-                if cutoff > 0:
-                    cutoffs.append(cutoff)
-            
-            comparison_data.append({
+            college = {
                 "college_code": college_code,
-                "college_name": college_info["college_name"],
-                "total_branches": len(branches),
-                "best_cutoff": min(cutoffs) if cutoffs else 0,
-                "avg_cutoff": builtin_round(sum(cutoffs) / len(cutoffs)) if cutoffs else 0,
-                "worst_cutoff": max(cutoffs) if cutoffs else 0,
-                "branches": branches  # Full branch list
-            })
+                "college_name": rows[0]["college_name"],
+                "total_branches": len(rows),
+                "best_cutoff": best or 0,
+                "avg_cutoff": builtin_round(total / count) if count else 0,
+                "worst_cutoff": worst or 0,
+            }
+            if include_branches:
+                college["branches"] = college_branches(rows)["branches"]  # Full branch list
+            comparison_data.append(college)
         
         return {
             "round": round,
@@ -578,73 +1015,42 @@ class CollegeService:
         """
         if branch_name:
             # Get stats for specific branch
-            query = f"""
-            SELECT college_code, college_name, branch_name,
-                   CASE 
-                       WHEN ? = 1 THEN GM_rank_r1
-                       WHEN ? = 2 THEN GM_rank_r2
-                       WHEN ? = 3 THEN GM_rank_r3
-                   END as cutoff_rank
-            FROM kcet_2024
-            WHERE LOWER(branch_name) = LOWER(?)
-            AND CASE 
-                    WHEN ? = 1 THEN GM_rank_r1 IS NOT NULL
-                    WHEN ? = 2 THEN GM_rank_r2 IS NOT NULL
-                    WHEN ? = 3 THEN GM_rank_r3 IS NOT NULL
-                END
-            ORDER BY cutoff_rank ASC
-            """
-            results = execute_query(query, (round, round, round, branch_name, round, round, round))
+            rank_column(round)  # Rejects unknown rounds
+            # Aggregates and the top colleges in one query, without fetching every row
+            results = execute_query(
+                BRANCH_POPULARITY_SQL[round],
+                (branch_name, branch_name, BRANCH_TOP_COLLEGES),
+                as_dict=False
+            )
             
             if not results:
                 raise NoDataFoundError(f"No data found for branch: {branch_name}")
             
-            cutoffs = [r["cutoff_rank"] for r in results]
+            stats = results[0]
+            best_cutoff = stats["best_cutoff"]
             
             return {
                 "branch_name": branch_name,
                 "round": round,
-                "total_colleges": len(results),
-                "best_cutoff": min(cutoffs),
-                "avg_cutoff": builtin_round(sum(cutoffs) / len(cutoffs)),
-                "worst_cutoff": max(cutoffs),
-                "competitiveness": "High" if min(cutoffs) < 5000 else "Medium" if min(cutoffs) < 20000 else "Low",
-                "top_colleges": results[:10]  # Top 10 colleges offering this branch
+                "total_colleges": stats["total_colleges"],
+                "best_cutoff": best_cutoff,
+                "avg_cutoff": builtin_round(stats["avg_cutoff"]),
+                "worst_cutoff": stats["worst_cutoff"],
+                "competitiveness": "High" if best_cutoff < 5000 else "Medium" if best_cutoff < 20000 else "Low",
+                "top_colleges": [
+                    {
+                        "college_code": row["college_code"],
+                        "college_name": row["college_name"],
+                        "branch_name": row["branch_name"],
+                        "cutoff_rank": row["cutoff_rank"],
+                    }
+                    for row in results
+                ]
             }
         else:
-            # Get summary of all branches
-            query = f"""
-            SELECT branch_name, COUNT(*) as college_count,
-                   MIN(CASE 
-                       WHEN ? = 1 THEN GM_rank_r1
-                       WHEN ? = 2 THEN GM_rank_r2
-                       WHEN ? = 3 THEN GM_rank_r3
-                   END) as best_cutoff,
-                   AVG(CASE 
-                       WHEN ? = 1 THEN GM_rank_r1
-                       WHEN ? = 2 THEN GM_rank_r2
-                       WHEN ? = 3 THEN GM_rank_r3
-                   END) as avg_cutoff
-            FROM kcet_2024
-            WHERE CASE 
-                    WHEN ? = 1 THEN GM_rank_r1 IS NOT NULL
-                    WHEN ? = 2 THEN GM_rank_r2 IS NOT NULL
-                    WHEN ? = 3 THEN GM_rank_r3 IS NOT NULL
-                END
-            GROUP BY branch_name
-            ORDER BY best_cutoff ASC
-            """
-            results = execute_query(query, (round, round, round, round, round, round, round, round, round))
-            
-            branches_summary = []
-            for row in results:
-                branches_summary.append({
-                    "branch_name": row["branch_name"],
-                    "college_count": row["college_count"],
-                    "best_cutoff": builtin_round(row["best_cutoff"]) if row["best_cutoff"] else 0,
-                    "avg_cutoff": builtin_round(row["avg_cutoff"]) if row["avg_cutoff"] else 0,
-                    "competitiveness": "High" if row["best_cutoff"] and row["best_cutoff"] < 5000 else "Medium" if row["best_cutoff"] and row["best_cutoff"] < 20000 else "Low"
-                })
+            # Get summary of all branches (aggregated once per round)
+            rank_column(round)  # Rejects unknown rounds
+            branches_summary = [dict(entry) for entry in load_branch_summary(round)]
             
             return {
                 "round": round,
@@ -9,8 +9,19 @@ import json
 
 BASE_URL = "http://localhost:8000"
 
-def print_test(name, url, params=None):
-    """Helper function to test an endpoint"""
+
+def fetch(session, url, params=None):
+    """GET an endpoint, returning its JSON or the error raised"""
+    try:
+        response = session.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        return e
+
+
+def print_test(name, url, params=None, data=None):
+    """Helper function to print the result of an endpoint test"""
     print(f"\n{'='*60}")
     print(f"TEST: {name}")
     print(f"URL: {url}")
@@ -18,31 +29,27 @@ def print_test(name, url, params=None):
         print(f"Params: {params}")
     print('='*60)
     
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        if isinstance(data, dict) and 'colleges' in data:
-            print(f"✅ Success! Found {data.get('total_count', len(data['colleges']))} colleges")
-            if data['colleges']:
-                print(f"\nFirst college:")
-                first = data['colleges'][0]
-                print(f"  - {first.get('college_name')}")
-                print(f"  - Branch: {first.get('branch_name', 'N/A')}")
-                print(f"  - Cutoff: {first.get('cutoff_rank', 'N/A')}")
-                
-                if len(data['colleges']) > 1:
-                    print(f"\nLast college:")
-                    last = data['colleges'][-1]
-                    print(f"  - {last.get('college_name')}")
-                    print(f"  - Branch: {last.get('branch_name', 'N/A')}")
-                    print(f"  - Cutoff: {last.get('cutoff_rank', 'N/A')}")
-        else:
-            print(f"✅ Success! Response: {json.dumps(data, indent=2)[:200]}")
+    if isinstance(data, Exception):
+        print(f"❌ Error: {data}")
+        return
+    
+    if isinstance(data, dict) and 'colleges' in data:
+        print(f"✅ Success! Found {data.get('total_count', len(data['colleges']))} colleges")
+        if data['colleges']:
+            print(f"\nFirst college:")
+            first = data['colleges'][0]
+            print(f"  - {first.get('college_name')}")
+            print(f"  - Branch: {first.get('branch_name', 'N/A')}")
+            print(f"  - Cutoff: {first.get('cutoff_rank', 'N/A')}")
             
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error: {e}")
+            if len(data['colleges']) > 1:
+                print(f"\nLast college:")
+                last = data['colleges'][-1]
+                print(f"  - {last.get('college_name')}")
+                print(f"  - Branch: {last.get('branch_name', 'N/A')}")
+                print(f"  - Cutoff: {last.get('cutoff_rank', 'N/A')}")
+    else:
+        print(f"✅ Success! Response: {json.dumps(data, indent=2)[:200]}")
 
 def main():
     print("\n" + "="*60)
@@ -50,52 +57,60 @@ def main():
     print("Testing Pagination & Sorting Features")
     print("="*60)
     
-    # Test 1: Default behavior (top 10 colleges)
-    print_test(
-        "Default - Get top 10 colleges for rank 5000",
-        f"{BASE_URL}/colleges/by-rank/5000",
-        {"round": 1}
-    )
-    
-    # Test 2: Custom limit
-    print_test(
-        "Custom Limit - Get top 25 colleges for rank 5000",
-        f"{BASE_URL}/colleges/by-rank/5000",
-        {"round": 1, "limit": 25}
-    )
-    
-    # Test 3: Descending sort
-    print_test(
-        "Descending Sort - Get worst 10 colleges for rank 5000",
-        f"{BASE_URL}/colleges/by-rank/5000",
-        {"round": 1, "limit": 10, "sort_order": "desc"}
-    )
-    
-    # Test 4: Branch with limit
-    print_test(
-        "Branch Search - Top 15 Computer Science colleges",
-        f"{BASE_URL}/colleges/by-branch/Computer Science Engineering",
-        {"round": 1, "limit": 15, "sort_order": "asc"}
-    )
-    
-    # Test 5: Search with all params
-    print_test(
-        "Advanced Search - Rank range 5000-10000, limited to 20",
-        f"{BASE_URL}/colleges/search",
-        {
-            "min_rank": 5000,
-            "max_rank": 10000,
-            "round": 1,
-            "limit": 20,
-            "sort_order": "asc"
-        }
-    )
+    cases = [
+        # Test 1: Default behavior (top 10 colleges)
+        (
+            "Default - Get top 10 colleges for rank 5000",
+            f"{BASE_URL}/colleges/by-rank/5000",
+            {"round": 1}
+        ),
+        
+        # Test 2: Custom limit
+        (
+            "Custom Limit - Get top 25 colleges for rank 5000",
+            f"{BASE_URL}/colleges/by-rank/5000",
+            {"round": 1, "limit": 25}
+        ),
+        
+        # Test 3: Descending sort
+        (
+            "Descending Sort - Get worst 10 colleges for rank 5000",
+            f"{BASE_URL}/colleges/by-rank/5000",
+            {"round": 1, "limit": 10, "sort_order": "desc"}
+        ),
+        
+        # Test 4: Branch with limit
+        (
+            "Branch Search - Top 15 Computer Science colleges",
+            f"{BASE_URL}/colleges/by-branch/Computer Science Engineering",
+            {"round": 1, "limit": 15, "sort_order": "asc"}
+        ),
+        
+        # Test 5: Search with all params
+        (
+            "Advanced Search - Rank range 5000-10000, limited to 20",
+            f"{BASE_URL}/colleges/search",
+            {
+                "min_rank": 5000,
+                "max_rank": 10000,
+                "round": 1,
+                "limit": 20,
+                "sort_order": "asc"
+            }
+        ),
+        
+        # Test 6: Get all branches
+        (
+            "Get All Branches",
+            f"{BASE_URL}/branches/list",
+            None
+        ),
+    ]
     
-    # Test 6: Get all branches
-    print_test(
-        "Get All Branches",
-        f"{BASE_URL}/branches/list"
-    )
+    # Run every check over one keep-alive session, so the connection is reused
+    with requests.Session() as session:
+        for case in cases:
+            print_test(*case, data=fetch(session, *case[1:]))
     
     print("\n" + "="*60)
     print("✅ All tests completed!")
@@ -11,10 +11,13 @@ def test_cors():
     print("🧪 Testing CORS Configuration\n")
     print("=" * 60)
     
+    # One keep-alive session for every request
+    session = requests.Session()
+    
     # Test 1: OPTIONS preflight request
     print("\n1️⃣  Testing OPTIONS Preflight Request...")
     try:
-        response = requests.options(
+        response = session.options(
             "http://localhost:8000/api/branches/all",
             headers={
                 "Origin": "http://example.com",
@@ -46,7 +49,7 @@ def test_cors():
     # Test 2: GET request with Origin header
     print("\n2️⃣  Testing GET Request with Origin Header...")
     try:
-        response = requests.get(
+        response = session.get(
             "http://localhost:8000/api/branches/all",
             headers={"Origin": "http://localhost:3000"}
         )
@@ -66,7 +69,7 @@ def test_cors():
     # Test 3: POST request
     print("\n3️⃣  Testing POST Request...")
     try:
-        response = requests.post(
+        response = session.post(
             "http://localhost:8000/api/chat/sessions",
             headers={
                 "Origin": "https://random-domain.com",
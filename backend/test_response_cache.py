@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Quick test script to verify the AI agent's response cache
+Uses a stand-in Gemini model, so no API key or backend needs to be running
+"""
+import asyncio
+
+from app.ai.agent import AIAgent
+from app.ai.cache import response_cache
+from app.ai.session_manager import ChatSession, Message
+
+
+class FakeText:
+    """One streamed text chunk"""
+
+    def __init__(self, text):
+        self.text = text
+        self.candidates = []
+
+
+class FakeResponse:
+    """Streamed response with a single text chunk and no function calls"""
+
+    def __init__(self, text):
+        self.chunk = FakeText(text)
+        self.candidates = []
+
+    def __aiter__(self):
+        async def chunks():
+            yield self.chunk
+        return chunks()
+
+
+class FakeChat:
+    def __init__(self, model):
+        self.model = model
+        self.history = []
+
+    async def send_message_async(self, content, stream=False, **kwargs):
+        self.model.sent.append(content)
+        return FakeResponse(f"answer {len(self.model.sent)}")
+
+
+class FakeModel:
+    def __init__(self):
+        self.sent = []
+
+    def start_chat(self, history=None, **kwargs):
+        return FakeChat(self)
+
+
+def ask(agent: AIAgent, session: ChatSession, text: str) -> str:
+    """Run one turn the way the chat route does"""
+    async def run():
+        return [chunk async for chunk in agent.process_message(text, session)]
+
+    session.add_message(Message(role="user", content=text))
+    reply = "".join(asyncio.run(run()))
+    session.add_message(Message(role="assistant", content=reply))
+    return reply
+
+
+def new_session() -> ChatSession:
+    session = ChatSession()
+    session.add_message(Message(role="assistant", content="Welcome!"))
+    return session
+
+
+def test_first_turn_hit():
+    """The same opening question in a new session is answered from the cache"""
+    response_cache.clear()
+    agent = AIAgent()
+    agent.model = FakeModel()
+
+    first = ask(agent, new_session(), "I got rank 5000, which colleges?")
+    second = ask(agent, new_session(), "  i got RANK 5000, which colleges? ")
+    assert first == second == "answer 1", (first, second)
+    assert len(agent.model.sent) == 1, agent.model.sent
+    print("✅ Opening question served from cache")
+
+
+def test_later_turns_not_cached():
+    """Follow-ups depend on the conversation and always reach Gemini"""
+    response_cache.clear()
+    agent = AIAgent()
+    agent.model = FakeModel()
+
+    session = new_session()
+    ask(agent, session, "hello")
+    assert ask(agent, session, "more") == "answer 2"
+    assert ask(agent, session, "more") == "answer 3"
+    print("✅ Follow-up questions sent to Gemini")
+
+
+if __name__ == "__main__":
+    test_first_turn_hit()
+    test_later_turns_not_cached()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Quick test script to verify the SQLite chat session store
+Uses a temporary sessions directory, so no backend needs to be running
+"""
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.ai.session_manager import (
+    CONTENT_REF_MIN_LENGTH,
+    MESSAGE_WINDOW,
+    SESSIONS_DB_NAME,
+    Message,
+    SessionManager,
+)
+
+
+def new_manager() -> SessionManager:
+    return SessionManager(Path(tempfile.mkdtemp()))
+
+
+def message_text(index: int) -> str:
+    """Every tenth message is long enough to be stored in content_blobs"""
+    if index % 10 == 0:
+        return f"long {index % 20} " + "x" * CONTENT_REF_MIN_LENGTH
+    return f"message {index}"
+
+
+def test_window_round_trip():
+    """Messages beyond the in-memory window are written and reload in order"""
+    manager = new_manager()
+    session = manager.create_session()
+    total = MESSAGE_WINDOW + 50
+    for index in range(total):
+        session.add_message(Message(role="user" if index % 2 else "assistant", content=message_text(index)))
+        # Write every few messages, so some of them leave the window unwritten
+        if index % 7 == 0:
+            manager.mark_dirty(session)
+    manager.mark_dirty(session)
+    manager.flush()
+    assert len(session.messages) == MESSAGE_WINDOW
+    assert session.message_count == total
+
+    conn = sqlite3.connect(manager.sessions_dir / SESSIONS_DB_NAME)
+    rows = conn.execute(
+        "SELECT m.seq, COALESCE(b.content, m.content), m.content_ref "
+        "FROM messages AS m LEFT JOIN content_blobs AS b ON b.content_ref = m.content_ref "
+        "WHERE m.session_id = ? ORDER BY m.seq",
+        (session.session_id,)
+    ).fetchall()
+    assert [seq for seq, _, _ in rows] == list(range(total))
+    assert [content for _, content, _ in rows] == [message_text(index) for index in range(total)]
+    refs = {ref for _, _, ref in rows if ref}
+    assert len(refs) == 2, refs
+    assert conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0] == 2
+    conn.close()
+
+    reloaded = SessionManager(manager.sessions_dir).get_session(session.session_id)
+    assert reloaded is not None
+    assert reloaded.message_count == total
+    assert reloaded.message_offset == total - MESSAGE_WINDOW
+    assert [msg.content for msg in reloaded.messages] == [
+        message_text(index) for index in range(total - MESSAGE_WINDOW, total)
+    ]
+    print("✅ Windowed messages written and reloaded")
+
+
+def test_delete_waits_for_queued_write():
+    """A delete racing a queued write leaves nothing behind"""
+    manager = new_manager()
+    write_rows = manager._write_rows
+    started = threading.Event()
+
+    def slow_write_rows(conn, session_rows, message_rows):
+        started.set()
+        time.sleep(0.5)
+        write_rows(conn, session_rows, message_rows)
+
+    manager._write_rows = slow_write_rows
+    session = manager.create_session()
+    session.add_message(Message(role="user", content="x" * CONTENT_REF_MIN_LENGTH))
+    manager.mark_dirty(session)
+    assert started.wait(5)
+
+    assert manager.delete_session(session.session_id)
+    manager.flush()
+    assert manager.get_session(session.session_id) is None
+    assert session.session_id not in manager.list_sessions()
+    conn = sqlite3.connect(manager.sessions_dir / SESSIONS_DB_NAME)
+    assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0] == 0
+    conn.close()
+    print("✅ Delete waited for the queued write")
+
+
+def test_cleanup_old_sessions():
+    """Only sessions not updated within the cutoff are removed"""
+    manager = new_manager()
+    old = manager.create_session()
+    old.add_message(Message(role="user", content="old"))
+    old.updated_at = datetime.now() - timedelta(days=10)
+    manager.mark_dirty(old)
+    fresh = manager.create_session()
+    fresh.add_message(Message(role="user", content="fresh"))
+    manager.mark_dirty(fresh)
+
+    manager.cleanup_old_sessions(days=7)
+    assert manager.list_sessions() == [fresh.session_id]
+    assert manager.get_session(old.session_id) is None
+    assert [msg.content for msg in manager.get_session(fresh.session_id).messages] == ["fresh"]
+    print("✅ Old sessions cleaned up")
+
+
+if __name__ == "__main__":
+    test_window_round_trip()
+    test_delete_waits_for_queued_write()
+    test_cleanup_old_sessions()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Quick test script to verify Gemini tool schemas built from docstrings
+No backend needs to be running
+"""
+from typing import Optional
+
+from app.ai.tools import TOOL_SCHEMAS, _build_schema
+
+
+def wrapped_tool(name: str, limit: Optional[int] = None):
+    """
+    Example tool with a wrapped argument description.
+
+    Args:
+        name: First line of the name description
+            that continues on a second line
+            and a third
+        limit: Maximum number of rows
+
+    Returns:
+        Nothing
+    """
+
+
+def test_wrapped_arg_lines():
+    """Continuation lines are appended to the previous argument"""
+    properties = _build_schema(wrapped_tool)["parameters"]["properties"]
+    assert properties["name"]["description"] == (
+        "First line of the name description that continues on a second line and a third"
+    )
+    assert properties["limit"]["description"] == "Maximum number of rows"
+    print("✅ Wrapped Args lines parsed")
+
+
+def test_compare_colleges_schema():
+    """include_branches keeps the full description"""
+    schema = next(s for s in TOOL_SCHEMAS if s["name"] == "compare_colleges")
+    description = schema["parameters"]["properties"]["include_branches"]["description"]
+    assert description.endswith("when only the best/average/worst cutoffs are needed"), description
+    print("✅ compare_colleges schema:", description)
+
+
+if __name__ == "__main__":
+    test_wrapped_arg_lines()
+    test_compare_colleges_schema()
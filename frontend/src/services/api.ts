@@ -42,6 +42,7 @@ export interface College {
 
 export interface CollegeList {
   colleges: College[];
+  returned_count?: number;
   total_count?: number;
 }
 
@@ -76,6 +77,9 @@ export interface SearchParams {
   round?: number;
   limit?: number;
   sort_order?: 'asc' | 'desc';
+  // Last row of the previous page, to fetch the next one
+  after_college_code?: string;
+  after_branch?: string;
 }
 
 // API Service
@@ -140,6 +144,10 @@ export const collegeApi = {
     if (params.min_rank) queryParams.min_rank = params.min_rank;
     if (params.max_rank) queryParams.max_rank = params.max_rank;
     if (params.limit) queryParams.limit = params.limit;
+    if (params.after_college_code && params.after_branch) {
+      queryParams.after_college_code = params.after_college_code;
+      queryParams.after_branch = params.after_branch;
+    }
     
     // Add branches as multiple query parameters
     if (params.branches && params.branches.length > 0) {
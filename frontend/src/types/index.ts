@@ -7,6 +7,7 @@ export interface College {
 
 export interface CollegeList {
   colleges: College[];
+  returned_count?: number;
   total_count: number;
 }
 